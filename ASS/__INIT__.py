@@ -2,27 +2,37 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import importlib
 import sys
 
-from .base_panel import BasePanel
-from .downloader import Downloader
-from .installer import Installer
-from .welcome_panel import WelcomePanel
+# Names are only imported when first used, so headless installs never load wxPython
+_LAZY_IMPORTS = {
+	"BasePanel": ".base_panel",
+	"CheckBoxGrid": ".checkbox_grid",
+	"CheckBoxItemPanel": ".checkbox_grid",
+	"ComponentSelectionPanel": ".component_selection_panel",
+	"ConfirmationDialog": ".confirmation_dialog",
+	"DownloadAndInstallPanel": ".download_and_install_panel",
+	"Downloader": ".downloader",
+	"FinishPanel": ".finish_panel",
+	"InstallationPathPanel": ".installation_path_panel",
+	"InstallationReviewPanel": ".installation_review_panel",
+	"Installer": ".installer",
+	"InstallerFrame": ".installer_frame",
+	"InstallObserver": ".observer",
+	"SteamLaunchOptionsPanel": ".steam_launch_options_panel",
+	"WelcomePanel": ".welcome_panel"
+}
 
-from .checkbox_grid import CheckBoxItemPanel, CheckBoxGrid
-from .component_selection_panel import ComponentSelectionPanel
-from .confirmation_dialog import ConfirmationDialog
-from .download_and_install_panel import DownloadAndInstallPanel
-from .downloader import Downloader
-from .finish_panel import FinishPanel
-from .installation_path_panel import InstallationPathPanel
-from .installation_review_panel import InstallationReviewPanel
-from .installer_frame import InstallerFrame
-if sys.platform == 'win32':
-	from .steam_launch_options_panel import SteamLaunchOptionsPanel
-else:
-	SteamLaunchOptionsPanel = None
-from .welcome_panel import WelcomePanel
+def __getattr__(name):
+	if name not in _LAZY_IMPORTS:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	if name == "SteamLaunchOptionsPanel" and sys.platform != 'win32':
+		value = None
+	else:
+		value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+	globals()[name] = value
+	return value
 
 __all__ = tuple([ mod for mod in 
 	[
@@ -38,7 +48,8 @@ __all__ = tuple([ mod for mod in
 		"InstallationReviewPanel",
 		"Installer",
 		"InstallerFrame",
+		"InstallObserver",
 		"SteamLaunchOptionsPanel",
 		"WelcomePanel"
-	] if mod is not None
+	] if mod != "SteamLaunchOptionsPanel" or sys.platform == 'win32'
 ])
\ No newline at end of file
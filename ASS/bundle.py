@@ -0,0 +1,113 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from dataclasses import asdict
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import shutil
+from typing import Any, Dict, Optional
+import zipfile
+
+from ASS.download_store import DownloadStore
+from ASS.downloader import component_selection
+from ASS.exceptions import BundleError
+from ASS.observer import InstallObserver
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+PAYLOAD_DIR = "payloads"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+def write_bundle(path: str, download_info: Dict[str, Any], downloader, observer: Optional[InstallObserver]=None):
+	"""Write every downloaded component, and the release metadata it was resolved from, to one file.
+
+	Payloads are stored uncompressed: they are zips already, and a stored member can be
+	copied back out at disk speed.
+	"""
+	components = {}
+	temp_path = f"{path}.tmp"
+	with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_STORED) as bundle:
+		for name, info in download_info.items():
+			digest = info.get('download_digest')
+			if digest is None:
+				raise BundleError(f"{name} was not downloaded, so it cannot be bundled")
+			release = downloader.get_release(name)
+			asset = downloader.get_asset(name)
+			stored_path = downloader.store.path_for(digest)
+			member = f"{PAYLOAD_DIR}/{digest}{''.join(stored_path.suffixes)}"
+			if member not in bundle.namelist():
+				bundle.write(stored_path, member)
+			components[name] = {
+				'selection': component_selection(info),
+				'release': {'title': release.title, 'tag_name': release.tag_name, 'prerelease': release.prerelease},
+				'asset': asdict(asset),
+				'sha256': digest,
+				'member': member
+			}
+			if observer is not None:
+				observer.log(f"Bundled {name} {release.tag_name}")
+		manifest = {'version': BUNDLE_VERSION, 'created': datetime.now(timezone.utc).isoformat(), 'components': components}
+		bundle.writestr(MANIFEST_NAME, json.dumps(manifest, indent=1))
+	os.replace(temp_path, path)
+	return manifest
+
+class Bundle:
+	"""Reads a bundle written by write_bundle, standing in for GitHub and the network."""
+	def __init__(self, path: str):
+		self.path = path
+		self.archive = zipfile.ZipFile(path)
+		try:
+			self.manifest = json.loads(self.archive.read(MANIFEST_NAME))
+		except (KeyError, ValueError) as e:
+			self.archive.close()
+			raise BundleError(f"{path} is not an installer bundle") from e
+		if self.manifest.get('version') != BUNDLE_VERSION:
+			self.archive.close()
+			raise BundleError(f"{path} was written by an incompatible version of the installer")
+		self.components = self.manifest.get('components', {})
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def close(self):
+		self.archive.close()
+
+	def _entry(self, name: str, info: Dict[str, Any]) -> Dict[str, Any]:
+		entry = self.components.get(name)
+		if entry is None:
+			raise BundleError(f"{self.path} does not contain {name}")
+		if entry['selection'] != component_selection(info):
+			raise BundleError(f"{name} was bundled with different choices than the ones selected now")
+		return entry
+
+	def load_into(self, download_info: Dict[str, Any], store: DownloadStore, observer: Optional[InstallObserver]=None):
+		"""Put every selected component's payload in the store, as the Downloader would have.
+
+		Each payload is checked against the digest recorded when the bundle was written before
+		anything can be extracted from it; payloads the store already holds are not copied at all.
+		"""
+		# Check the whole selection first so a mismatch doesn't leave half the payloads copied
+		entries = {name: self._entry(name, info) for name, info in download_info.items()}
+		for name, entry in entries.items():
+			asset = entry['asset']
+			digest = entry['sha256']
+			path = store.lookup(asset_id=asset['id'], url=asset['browser_download_url'], digest=digest)
+			if path is None or DownloadStore.digest_for_path(path) != digest:
+				part_path = store.partial_path(f"bundle-{digest}")
+				with self.archive.open(entry['member']) as source, open(part_path, 'wb') as target:
+					shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+				ext = entry['member'][len(f"{PAYLOAD_DIR}/{digest}"):]
+				# Raises ChecksumMismatchException if the bundle was damaged or tampered with
+				path = store.add(part_path, asset_id=asset['id'], url=asset['browser_download_url'], expected_digest=digest, ext=ext)
+			download_info[name]['download_path'] = path
+			download_info[name]['download_digest'] = digest
+			if observer is not None:
+				observer.log(f"Loaded {name} {entry['release']['tag_name']} from {os.path.basename(self.path)}")
@@ -0,0 +1,240 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from dataclasses import asdict
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+import re
+import socket
+import threading
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from ASS.downloader import Downloader, component_selection
+from ASS.exceptions import DownloadedFileNotFoundException
+from ASS.github_api import AssetRecord
+from ASS.observer import InstallObserver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8750
+SEND_CHUNK_SIZE = 256 * 1024
+# Only open-ended ranges from a given offset, which is all the Downloader asks for when resuming
+RANGE = re.compile(r'bytes=(\d+)-\d*')
+
+def default_interface() -> str:
+	"""This machine's address on the network its default route leads to, or loopback without one."""
+	with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+		try:
+			# Connecting a UDP socket sends nothing; it only picks the outgoing interface
+			probe.connect(('10.255.255.255', 1))
+			return probe.getsockname()[0]
+		except OSError:
+			return '127.0.0.1'
+
+class SingleFlight:
+	"""Runs a call once per key at a time; callers arriving while it runs wait for the same result."""
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._calls = {}
+		self.shared = 0
+
+	def do(self, key, fn: Callable[[], Any]) -> Any:
+		with self._lock:
+			call = self._calls.get(key)
+			owner = call is None
+			if owner:
+				call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+			else:
+				self.shared += 1
+		if owner:
+			try:
+				call['result'] = fn()
+			except Exception as e:
+				call['error'] = e
+			finally:
+				with self._lock:
+					del self._calls[key]
+				call['done'].set()
+		else:
+			call['done'].wait()
+		if call['error'] is not None:
+			raise call['error']
+		return call['result']
+
+def selection_key(info: Dict[str, Any]) -> str:
+	"""Stable name for a component's selection, so the Downloader's per-component caches apply."""
+	return hashlib.sha1(json.dumps(component_selection(info), sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def allowed_selections(download_info: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+	"""Every selection an installer using this download_info can ask for, keyed by selection_key.
+
+	That is each component as configured, with or without its alternative build, and with or
+	without prereleases if it offers them.
+	"""
+	allowed = {}
+	for info in download_info.values():
+		selector = info.get('asset_selector')
+		prereleases = {False, True} if info.get('offer_prerelease', False) else {bool(info.get('include_prerelease', False))}
+		for match in ({False, True} if selector else {False}):
+			for prerelease in prereleases:
+				variant = dict(info, include_prerelease=prerelease)
+				if selector:
+					variant['asset_selector'] = dict(selector, match=match)
+				allowed[selection_key(variant)] = variant
+	return allowed
+
+def selection_from_query(query: Dict[str, list]) -> Dict[str, Any]:
+	"""Rebuild a download_info entry from the selection a client sent."""
+	def value(key):
+		return query.get(key, [None])[0]
+	info = {'repository': value('repository'), 'include_prerelease': value('include_prerelease') == '1'}
+	if not info['repository'] or info['repository'].count('/') != 1:
+		raise ValueError("A repository in owner/name form is required")
+	if value('release_title_filter'):
+		info['release_title_filter'] = value('release_title_filter')
+	if value('asset_pattern'):
+		info['asset_selector'] = {'pattern': value('asset_pattern'), 'match': value('asset_match') == '1'}
+	return info
+
+class CacheServer:
+	"""Serves this machine's release metadata and download store to other installers on the LAN.
+
+	Clients ask /v1/resolve with a component's selection. On a miss the server resolves and
+	downloads it from GitHub itself, and concurrent requests for the same selection share that
+	one fetch, as do selections resolving to the same asset. The answer points at /v1/objects/<sha256>, which serves the stored file with
+	Range support, so a classroom of installers costs one download over the uplink.
+
+	Only the components in the server's own download_info are served. There is no
+	authentication, so anything else would make it an open proxy to GitHub, and client
+	supplied release filters would be regular expressions run on the server.
+	"""
+	def __init__(self, app_dir: str, download_info: Dict[str, Any], downloader_options: Dict[str, Any], token: Optional[str]=None, host: Optional[str]=None, port: int=DEFAULT_PORT, observer: Optional[InstallObserver]=None):
+		# The server must always fetch from GitHub itself, never from another cache server
+		downloader_options = dict(downloader_options, cache_server=None)
+		self.observer = observer if observer is not None else InstallObserver()
+		self.downloader = Downloader(allowed_selections(download_info), token=token, download_dir=app_dir, observer=self.observer, **downloader_options)
+		self.fills = SingleFlight()
+		self.stats = {'resolves': 0, 'fills': 0, 'objects': 0, 'bytes_sent': 0}
+		self._stats_lock = threading.Lock()
+		self.server = ThreadingHTTPServer((host or default_interface(), port), self._handler_class())
+		self.server.daemon_threads = True
+
+	@property
+	def address(self) -> str:
+		host, port = self.server.server_address[:2]
+		return f"http://{host}:{port}"
+
+	def _count(self, key: str, amount: int=1):
+		with self._stats_lock:
+			self.stats[key] += amount
+
+	def _fill(self, name: str, asset: AssetRecord) -> Dict[str, Any]:
+		path = self.downloader.download_asset(name)
+		if path is None:
+			raise DownloadedFileNotFoundException(f"Download of {name} was canceled")
+		self._count('fills')
+		return {'asset': asdict(asset), 'sha256': self.downloader.store.digest_for_path(path)}
+
+	def offers(self, info: Dict[str, Any]) -> bool:
+		return selection_key(info) in self.downloader.download_info
+
+	def resolve(self, info: Dict[str, Any]) -> Dict[str, Any]:
+		self._count('resolves')
+		name = selection_key(info)
+		# Several selections, e.g. with and without prereleases, often resolve to the same asset; fetch it once
+		asset = self.downloader.resolve_asset(name)
+		return self.fills.do(asset.id, lambda: self._fill(name, asset))
+
+	def serve_forever(self):
+		self.observer.log(f"Serving the download cache on {self.address}")
+		self.server.serve_forever()
+
+	def shutdown(self):
+		self.downloader.stop()
+		self.server.shutdown()
+		self.server.server_close()
+
+	def _handler_class(self):
+		cache = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = 'HTTP/1.1'
+
+			def log_message(self, format, *args):
+				logger.debug(f"{self.address_string()} {format % args}")
+
+			def send_json(self, status, data):
+				body = json.dumps(data).encode('utf-8')
+				self.send_response(status)
+				self.send_header('Content-Type', 'application/json')
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def do_GET(self):
+				url = urlparse(self.path)
+				if url.path == '/v1/resolve':
+					return self.resolve(parse_qs(url.query))
+				if url.path.startswith('/v1/objects/'):
+					return self.send_object(url.path[len('/v1/objects/'):])
+				if url.path == '/v1/status':
+					with cache._stats_lock:
+						stats = dict(cache.stats, shared_fills=cache.fills.shared)
+					budget = cache.downloader.github.rate_limit
+					if budget is not None:
+						stats['github_budget'] = budget._asdict()
+					return self.send_json(200, stats)
+				self.send_json(404, {'message': 'Not Found'})
+
+			def resolve(self, query):
+				try:
+					info = selection_from_query(query)
+				except ValueError as e:
+					return self.send_json(400, {'message': str(e)})
+				if not cache.offers(info):
+					return self.send_json(403, {'message': f"{info['repository']} with this selection is not offered by this cache server"})
+				try:
+					self.send_json(200, cache.resolve(info))
+				except Exception as e:
+					logger.exception(f"Could not fill the cache for {info}")
+					self.send_json(502, {'message': str(e)})
+
+			def send_object(self, digest):
+				if cache.downloader.store.digest_for_path(digest) != digest:
+					return self.send_json(404, {'message': 'Not Found'})
+				try:
+					path = cache.downloader.store.path_for(digest)
+				except DownloadedFileNotFoundException:
+					return self.send_json(404, {'message': 'Not Found'})
+				size = os.path.getsize(path)
+				start = 0
+				requested = self.headers.get('Range')
+				if requested:
+					match = RANGE.fullmatch(requested.strip())
+					start = int(match.group(1)) if match else size
+					if start >= size:
+						self.send_response(416)
+						self.send_header('Content-Range', f"bytes */{size}")
+						self.send_header('Content-Length', '0')
+						self.end_headers()
+						return
+					self.send_response(206)
+					self.send_header('Content-Range', f"bytes {start}-{size - 1}/{size}")
+				else:
+					self.send_response(200)
+				self.send_header('Content-Type', 'application/octet-stream')
+				self.send_header('Content-Length', str(size - start))
+				self.end_headers()
+				cache._count('objects')
+				with open(path, 'rb') as f:
+					f.seek(start)
+					for chunk in iter(lambda: f.read(SEND_CHUNK_SIZE), b''):
+						self.wfile.write(chunk)
+						cache._count('bytes_sent', len(chunk))
+
+		return Handler
@@ -8,22 +8,58 @@ import shutil
 import sys
 import tempfile
 import threading
+import time
 import wx
 import zipfile
 
 from ASS import BasePanel, Downloader, Installer
 from ASS.events import *
+from ASS.headless import component_info, downloader_options, installer_options
+from ASS.log_sink import LogSink
+from ASS.progress import DOWNLOAD, EXTRACT, describe
+from ASS.wx_observer import WxObserver
+
+logger = logging.getLogger(__name__)
+
+GAUGE_RANGE = 1000
+# Progress lines go to the log, which screen readers may read out, so keep them infrequent
+ANNOUNCE_INTERVAL = 5
+LOG_FLUSH_INTERVAL_MS = 250
+# Positions in the native Windows text box count each newline as \r\n
+NEWLINE_WIDTH = 2 if wx.Platform == '__WXMSW__' else 1
+
+def native_length(text):
+	return len(text) + text.count("\n") * (NEWLINE_WIDTH - 1)
 
 class DownloadAndInstallPanel(BasePanel):
 	def __init__(self, parent):
 		super(DownloadAndInstallPanel, self).__init__(parent, "Downloading and Installing Components")
 		frame = self.GetParent()
-		download_info = {k.replace('&', ''):v for k, v in frame.download_info.items()}
-		self.downloader = Downloader(download_info, token=frame.token, download_dir=frame.app_dir, panel=self)
-		self.installer = Installer(download_info, frame.installation_path, panel=self)
+		download_info = component_info(frame.download_info)
+		settings = frame.settings
+		# In pipelined mode each component is installed as soon as its own download finishes
+		self.pipelined = settings.get('pipelined_install', False)
+		self.observer = observer = WxObserver(self)
+		self.downloader = Downloader(download_info, token=frame.token, download_dir=frame.app_dir, observer=observer,
+			http=frame.http_session,
+			on_downloaded=self.on_component_downloaded,
+			**downloader_options(settings))
+		self.installer = Installer(download_info, frame.installation_path, observer=observer, store=self.downloader.store,
+			platform=frame.platform, **installer_options(settings))
+		# (component, phase) -> fraction done for the overall gauge. Every phase gets an equal share
+		# up front; weighting by bytes would grow the total as sizes become known and move the gauge backwards.
+		self.progress = {(name, phase): 0.0 for name in download_info for phase in (DOWNLOAD, EXTRACT)}
+		self.last_announced = {}
+		self.log_sink = LogSink()
 		self.setup_ui()
+		self.log_timer = wx.Timer(self)
+		self.Bind(wx.EVT_TIMER, self.flush_log, self.log_timer)
+		self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+		self.log_timer.Start(LOG_FLUSH_INTERVAL_MS)
+		self.Bind(EVT_PROGRESS, self.on_progress)
 		self.Bind(EVT_DOWNLOADS_COMPLETE, self.on_downloads_complete)
 		self.Bind(EVT_INSTALLATION_COMPLETE, self.on_installation_complete)
+		self.Bind(EVT_INSTALLATION_FAILED, self.on_installation_failed)
 		self.Bind(EVT_NOTIFY, self.on_notify)
 		self.download()
 
@@ -32,27 +68,89 @@ class DownloadAndInstallPanel(BasePanel):
 		instruction_text = wx.StaticText(self, label="Downloading components, please wait...")
 		self.main_sizer.Add(instruction_text, 0, wx.ALL | wx.EXPAND, 5)
 
+		# Overall progress across every component's download and unpacking
+		self.gauge = wx.Gauge(self, range=GAUGE_RANGE, name="Overall progress")
+		self.main_sizer.Add(self.gauge, 0, wx.ALL | wx.EXPAND, 5)
+		self.status_text = wx.StaticText(self, label="")
+		self.main_sizer.Add(self.status_text, 0, wx.ALL | wx.EXPAND, 5)
+
 		# Setup the read-only text box for download progress and messages
 		self.output_textbox = wx.TextCtrl(self, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.BORDER_SIMPLE)
 		self.main_sizer.Add(self.output_textbox, 1, wx.EXPAND | wx.ALL, 5)
 		self.output_textbox.SetFocus()
+		self.add_nav_button("Show full &log", self.on_show_log)
 
 	def log_message(self, message):
-		"""Utility function to append messages to the output text box."""
-		self.output_textbox.AppendText(message + "\n")
+		"""Queue a message for the output text box; safe to call from any thread."""
+		self.log_sink.write(message)
+
+	def flush_log(self, event=None):
+		"""Write everything logged since the last flush to the text box in one go."""
+		lines, dropped = self.log_sink.drain()
+		if not lines: return
+		if dropped:
+			# Only the most recent lines stay in the box; the rest are in the full log.
+			# Trimming the top instead of replacing the text lets screen readers keep their place.
+			self.output_textbox.Remove(0, sum(native_length(f"{line}\n") for line in dropped))
+		self.output_textbox.AppendText("".join(f"{line}\n" for line in lines))
+
+	def on_show_log(self, event):
+		from ASS.log_history_dialog import LogHistoryDialog
+		self.flush_log()
+		dialog = LogHistoryDialog(self, self.log_sink.history_text())
+		dialog.ShowModal()
+		dialog.Destroy()
+
+	def on_destroy(self, event):
+		if event.GetEventObject() is self:
+			self.log_timer.Stop()
+		event.Skip()
 
 	def download(self):
 		"""Starts the download process in a thread."""
-		threading.Thread(target=self.downloader.download_all, daemon=True).start()
+		threading.Thread(target=self.download_all, daemon=True).start()
+		if self.pipelined:
+			self.start_installer(self.installer.install_pipelined)
+
+	def download_all(self):
+		try:
+			self.downloader.download_all()
+		except Exception as e:
+			logger.exception("Downloading failed")
+			# Don't leave a pipelined installer waiting for downloads that will never come
+			self.installer.stop()
+			self.observer.installation_failed(f"Downloading failed: {e}")
 
 	def install(self):
-		with self.installer:
-			threading.Thread(target=self.installer.install_all, daemon=True).start()
+		self.start_installer(self.installer.install_all)
+
+	def start_installer(self, install):
+		def run():
+			# Enter the installer here so its temporary directory lives as long as the thread
+			with self.installer:
+				try:
+					install()
+				except Exception:
+					# Already reported to the observer and rolled back by the installer
+					pass
+		threading.Thread(target=run, daemon=True).start()
+
+	def on_component_downloaded(self, name):
+		# Runs on a download worker thread; the installer's queue takes care of the hand-over
+		if self.pipelined:
+			self.installer.enqueue(name)
+		# Files already in the store are never transferred, so they report no progress of their own
+		wx.CallAfter(self.update_gauge, name, DOWNLOAD, 1.0)
 
 	def on_downloads_complete(self, event):
-		self.install()
+		if self.pipelined:
+			self.installer.finish_queue()
+		else:
+			self.install()
 
 	def on_installation_complete(self, event):
+		self.gauge.SetValue(GAUGE_RANGE)
+		self.flush_log()
 		frame = self.GetParent()
 		if frame.platform == 'windows' and frame.is_steam_install:
 			from ASS import SteamLaunchOptionsPanel
@@ -61,12 +159,43 @@ class DownloadAndInstallPanel(BasePanel):
 			from ASS import FinishPanel 
 			wx.CallAfter(self.GetParent().switch_panel, FinishPanel)
 
+	def on_installation_failed(self, event):
+		message = event.GetMessage()
+		self.downloader.stop()
+		self.log_message(message)
+		self.flush_log()
+		self.status_text.SetLabel(message)
+		self.GetParent().dump_log(message)
+
 	def on_notify(self, event):
 		"""Update the text box with messages from the download / install process."""
 		message = event.GetMessage()
 		if message:
 			self.log_message(message)
 
+	def on_progress(self, event):
+		update = event.GetProgress()
+		if update is None: return
+		key = (update.component, update.phase)
+		fraction = 1.0 if update.finished else update.fraction
+		if fraction is not None:
+			self.update_gauge(update.component, update.phase, fraction)
+		text = describe(update)
+		self.status_text.SetLabel(text)
+		now = time.monotonic()
+		if update.finished or now - self.last_announced.get(key, 0) >= ANNOUNCE_INTERVAL:
+			self.last_announced[key] = now
+			self.log_message(text)
+
+	def update_gauge(self, component, phase, fraction):
+		# Called late from on_component_downloaded, possibly after the panel was switched away from
+		if not self: return
+		key = (component, phase)
+		# Only phases registered up front count, and a resumed transfer never takes back progress
+		if key not in self.progress or fraction <= self.progress[key]: return
+		self.progress[key] = fraction
+		self.gauge.SetValue(int(GAUGE_RANGE * sum(self.progress.values()) / len(self.progress)))
+
 	def on_cancel(self, event):
 		"""Stops the download process and potentially cleans up."""
 		dialog_result = self.show_cancel_confirmation_dialog()
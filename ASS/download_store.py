@@ -0,0 +1,164 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import threading
+import time
+from typing import Optional, Union
+
+from ASS.exceptions import ChecksumMismatchException, DownloadedFileNotFoundException
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+DEFAULT_BUDGET = 256 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+def sha256_file(path: Union[str, Path]) -> str:
+	digest = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+class DownloadStore:
+	"""Content-addressed store of downloaded assets, keyed by SHA-256.
+
+	An index maps asset ids and download URLs to digests so identical payloads are only kept
+	once, and least recently used objects are evicted when the store grows past its budget.
+	Objects used during this session are pinned so they survive until installation.
+	"""
+	def __init__(self, root: Union[str, Path], budget: int=DEFAULT_BUDGET):
+		self.root = Path(root)
+		self.objects_dir = self.root / "objects"
+		self.partial_dir = self.root / "partial"
+		self.index_path = self.root / "index.json"
+		self.budget = budget
+		self.objects_dir.mkdir(parents=True, exist_ok=True)
+		self.partial_dir.mkdir(parents=True, exist_ok=True)
+		self._lock = threading.RLock()
+		self._pinned = set()
+		self._index = {'objects': {}, 'assets': {}, 'urls': {}}
+		self._load()
+
+	def _load(self):
+		if not self.index_path.exists(): return
+		try:
+			with open(self.index_path, encoding='utf-8') as f:
+				index = json.load(f)
+		except (OSError, ValueError) as e:
+			logger.warning(f"Ignoring unreadable download store index {self.index_path}: {e}")
+			return
+		if index.get('version') != INDEX_VERSION: return
+		self._index = {key: index.get(key, {}) for key in ('objects', 'assets', 'urls')}
+
+	def _save(self):
+		temp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+		with open(temp_path, 'w', encoding='utf-8') as f:
+			json.dump({'version': INDEX_VERSION, **self._index}, f, separators=(',', ':'))
+		os.replace(temp_path, self.index_path)
+
+	def object_path(self, digest: str) -> Path:
+		ext = self._index['objects'].get(digest, {}).get('ext', '')
+		return self.objects_dir / digest[:2] / f"{digest}{ext}"
+
+	def partial_path(self, filename: str) -> Path:
+		return self.partial_dir / f"{filename}.part"
+
+	@staticmethod
+	def digest_for_path(path: Union[str, Path]) -> Optional[str]:
+		digest = Path(path).name.split('.')[0]
+		return digest if DIGEST_RE.match(digest) else None
+
+	@property
+	def total_size(self) -> int:
+		return sum(info['size'] for info in self._index['objects'].values())
+
+	def _use(self, digest: str) -> Optional[Path]:
+		info = self._index['objects'].get(digest)
+		if info is None: return None
+		path = self.object_path(digest)
+		if not path.exists() or path.stat().st_size != info['size']:
+			logger.warning(f"Dropping missing or damaged store object {digest}")
+			self._forget(digest)
+			return None
+		info['last_used'] = time.time()
+		self._pinned.add(digest)
+		return path
+
+	def lookup(self, asset_id: Optional[int]=None, url: Optional[str]=None, digest: Optional[str]=None) -> Optional[Path]:
+		"""Return the stored file for any of the given keys, marking it as recently used."""
+		with self._lock:
+			candidates = [digest, self._index['assets'].get(str(asset_id)), self._index['urls'].get(url)]
+			for candidate in candidates:
+				if candidate is None: continue
+				path = self._use(candidate)
+				if path is not None:
+					# Remember any new names this payload is known by
+					if asset_id is not None: self._index['assets'][str(asset_id)] = candidate
+					if url is not None: self._index['urls'][url] = candidate
+					self._save()
+					return path
+		return None
+
+	def path_for(self, digest: str) -> Path:
+		with self._lock:
+			path = self._use(digest)
+			if path is None:
+				raise DownloadedFileNotFoundException(f"Download {digest} is no longer in the store at {self.root}")
+			self._save()
+		return path
+
+	def add(self, path: Union[str, Path], asset_id: Optional[int]=None, url: Optional[str]=None, expected_digest: Optional[str]=None, ext: str='') -> Path:
+		"""Move a finished download into the store, returning the path of the stored object."""
+		path = Path(path)
+		digest = sha256_file(path)
+		if expected_digest is not None and digest != expected_digest.lower():
+			os.remove(path)
+			raise ChecksumMismatchException(f"{path.name} has SHA-256 {digest} but {expected_digest} was expected")
+		with self._lock:
+			if self._use(digest) is not None:
+				logger.debug(f"{path.name} is identical to stored object {digest}")
+				os.remove(path)
+			else:
+				self._index['objects'][digest] = {'size': path.stat().st_size, 'ext': ext, 'last_used': time.time()}
+				object_path = self.object_path(digest)
+				object_path.parent.mkdir(exist_ok=True)
+				os.replace(path, object_path)
+				self._pinned.add(digest)
+			if asset_id is not None: self._index['assets'][str(asset_id)] = digest
+			if url is not None: self._index['urls'][url] = digest
+			self.evict()
+			self._save()
+			return self.object_path(digest)
+
+	def _forget(self, digest: str):
+		self._index['objects'].pop(digest, None)
+		for mapping in (self._index['assets'], self._index['urls']):
+			for key in [key for key, value in mapping.items() if value == digest]:
+				del mapping[key]
+
+	def evict(self):
+		"""Remove least recently used objects until the store fits its budget."""
+		with self._lock:
+			total = self.total_size
+			if total <= self.budget: return
+			candidates = sorted((info['last_used'], digest) for digest, info in self._index['objects'].items() if digest not in self._pinned)
+			for _, digest in candidates:
+				if total <= self.budget: break
+				size = self._index['objects'][digest]['size']
+				try:
+					os.remove(self.object_path(digest))
+				except FileNotFoundError:
+					pass
+				self._forget(digest)
+				total -= size
+				logger.debug(f"Evicted {digest} ({size} bytes) from the download store")
+			self._save()
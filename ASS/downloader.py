@@ -2,67 +2,163 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
-import github
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import replace
 import logging
 import os
+from pathlib import Path
 import re
 import requests
-from typing import Dict, Any, Optional
-import wx
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
 
-from ASS.events import avEVT_DOWNLOADS_COMPLETE, avEVT_NOTIFY, DownloadsCompleteEvent, NotifyEvent
-from ASS.exceptions import ReleaseNotFoundException, RepositoryConfigurationError, RepositoryNotFoundException
+from ASS.download_store import DEFAULT_BUDGET, DownloadStore
+from ASS.exceptions import AssetNotFoundException, ChecksumMismatchException, IncompleteDownloadException, ReleaseNotFoundException, RepositoryConfigurationError, RepositoryNotFoundException
+from ASS.github_api import API_URL, AssetRecord, GitHubAPI, RepositoryRecord
+from ASS.github_graphql import GitHubGraphQL, GraphQLError, RepositoryReleases
+from ASS.http_session import HTTPSession
+from ASS.metadata_cache import DEFAULT_TTL, MetadataCache
+from ASS.observer import InstallObserver, resolve_observer
+from ASS.progress import DOWNLOAD, ProgressTracker
+from ASS.rate_limit import RateLimitScheduler
+from ASS.release_index import ReleaseIndex
+from ASS.throttle import ConcurrencyController, TokenBucket
 
 logger = logging.getLogger(__name__)
 
+METADATA_CACHE_FILENAME = "github_metadata.json"
+DOWNLOAD_STORE_DIRNAME = "downloads"
+CHUNK_SIZE = 8192
+DOWNLOAD_TIMEOUT = 30
+# A cache server may have to fetch from GitHub itself before it can answer
+CACHE_SERVER_TIMEOUT = (5, 600)
+# Errors after which the transfer can pick up where it left off
+RESUMABLE_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+# "bytes <first>-<last>/<full size or *>"
+CONTENT_RANGE = re.compile(r'bytes (\d+)-\d+/(\d+|\*)')
+
+def component_selection(info: Dict[str, Any]) -> Dict[str, Any]:
+	"""The choices in a download_info entry that decide which asset it resolves to."""
+	asset_selector = info.get('asset_selector') or {}
+	return {
+		'repository': info.get('repository'),
+		'release_title_filter': info.get('release_title_filter'),
+		'include_prerelease': bool(info.get('include_prerelease', False)),
+		'asset_pattern': asset_selector.get('pattern'),
+		'asset_match': bool(asset_selector.get('match', False))
+	}
+
 class Downloader:
-	def __init__(self, download_info: Dict[str, Any], token: Optional[str]=None, download_dir: Optional[str]=None, panel: Optional[wx.Panel]=None):
-		if __name__ != '__main__' and panel is None: raise TypeError('Downloader must have a panel unless running directly on the command line')
+	def __init__(self, download_info: Dict[str, Any], token: Optional[str]=None, download_dir: Optional[str]=None, panel=None, max_workers: int=1, cache_dir: Optional[str]=None, metadata_ttl: float=DEFAULT_TTL, download_retries: int=5, store_budget: int=DEFAULT_BUDGET, http: Optional[HTTPSession]=None, on_downloaded: Optional[Callable[[str], None]]=None, observer: Optional[InstallObserver]=None, api_url: str=API_URL, cache_server: Optional[str]=None, bandwidth_limit: float=0, adaptive_concurrency: bool=False, resolver: str='rest'):
 		self.panel = panel
+		# Messages and progress go through the observer; a panel alone gets them as wx events
+		self.observer = resolve_observer(observer, panel)
 		if download_dir is None:
 			download_dir = Path(os.path.abspath('.'))
 		self.download_dir = download_dir
-		self.github = github.Github(token)
+		if cache_dir is None:
+			cache_dir = download_dir
+		self.metadata_cache = MetadataCache(os.path.join(cache_dir, METADATA_CACHE_FILENAME), ttl=metadata_ttl)
+		# Number of components downloaded at once; 1 keeps the old sequential behaviour
+		self.max_workers = max(1, int(max_workers))
+		self.http = http if http is not None else HTTPSession(pool_size=self.max_workers + 1)
+		self.github = GitHubAPI(token, cache=self.metadata_cache, base_url=api_url, scheduler=RateLimitScheduler(report=self.log))
+		# 'graphql' resolves every repository's releases in one request, but GitHub only answers it with a token
+		self.graphql = None
+		if resolver == 'graphql':
+			if token:
+				self.graphql = GitHubGraphQL(token, base_url=api_url, session=self.http.session, scheduler=RateLimitScheduler(report=self.log))
+			else:
+				logger.debug("GraphQL needs a token, resolving releases over REST")
+		# Repositories already asked for over GraphQL, whether or not it worked
+		self._graphql_tried = set()
+		self.store = DownloadStore(Path(download_dir) / DOWNLOAD_STORE_DIRNAME, budget=store_budget)
 		self.download_info = download_info
 		logger.debug(f"Initializing Downloader with:\n{download_info}")
+		# Both keyed by repository, as several components may share one (e.g. Shockah's mods)
 		self.repos = {}
-		self.releases_cache = {}
-		self.assets_cache = {}
+		self.release_indexes = {}
 		self.keep_running = True
+		# PyGithub objects and our caches aren't safe to fill from several threads at once
+		self._metadata_lock = threading.Lock()
+		# One lock per .part file, so two callers resolving to the same asset never write to it together
+		self._part_locks = {}
+		self._part_locks_lock = threading.Lock()
+		self.download_retries = max(1, int(download_retries))
+		# Called from the worker thread with the component name as soon as each download is stored
+		self.on_downloaded = on_downloaded
+		# Another installer on the LAN serving its store; asked before GitHub when set
+		self.cache_server = cache_server.rstrip('/') if cache_server else None
+		# Bytes per second shared by every transfer, 0 for no limit
+		self.limiter = TokenBucket(bandwidth_limit)
+		# With adaptive concurrency, max_workers is only the ceiling; the controller picks how many transfer at once
+		self.concurrency = ConcurrencyController(self.max_workers) if adaptive_concurrency and self.max_workers > 1 else None
 
-	def get_repo(self, name: str) -> github.Repository:
-		if name not in self.repos:
-			repo_info = self.download_info.get(name)
-			if not repo_info:
-				raise RepositoryNotFoundException(f"Cannot load info for {name}")
-			self.repos[name] = self.github.get_repo(repo_info['repository'])
-		return self.repos[name]
+	def _repository_name(self, name: str) -> str:
+		repo_info = self.download_info.get(name)
+		if not repo_info:
+			raise RepositoryNotFoundException(f"Cannot load info for {name}")
+		return repo_info['repository']
 
-	def get_release(self, name: str):
-		repo = self.get_repo(name)
-		if name not in self.releases_cache:
-			self.releases_cache[name] = list(repo.get_releases())
+	def get_repo(self, name: str) -> RepositoryRecord:
+		repository = self._repository_name(name)
+		if repository not in self.repos:
+			self.repos[repository] = self.github.get_repo(repository)
+		return self.repos[repository]
 
-		repo_info = self.download_info[name]
-		include_prerelease = repo_info.get('include_prerelease', False)
-		title_filter = repo_info.get('release_title_filter', None)
+	def _add_release_index(self, repository: str, releases):
+		index = ReleaseIndex(repository, releases)
+		# Register every component using this repository so one walk through the pages serves them all
+		for info in self.download_info.values():
+			if info.get('repository') == repository:
+				index.register(info.get('release_title_filter', None), info.get('include_prerelease', False))
+		self.release_indexes[repository] = index
+
+	def _releases_after(self, result: RepositoryReleases):
+		"""The releases GraphQL returned, then older ones over REST should a lookup need them."""
+		yield from result.releases
+		seen = {release.id for release in result.releases}
+		# Continue from the first page GraphQL didn't cover; releases published meanwhile shift
+		# the pages, which the check against what was already seen takes care of
+		for release in self.github.get_releases(result.repository.full_name, skip=len(result.releases)):
+			if release.id not in seen:
+				yield release
+
+	def _resolve_with_graphql(self):
+		repositories = [info['repository'] for info in self.download_info.values() if info.get('repository') and info['repository'] not in self._graphql_tried]
+		if not repositories: return
+		self._graphql_tried.update(repositories)
+		try:
+			results = self.graphql.fetch_releases(repositories)
+		except (requests.RequestException, GraphQLError, KeyError, TypeError, ValueError) as e:
+			logger.warning(f"GraphQL release lookup failed, falling back to REST: {e}")
+			return
+		for repository, result in results.items():
+			# Left for REST, which reports a missing repository properly
+			if result is None: continue
+			self.repos[repository] = result.repository
+			self._add_release_index(repository, result.releases if result.complete else self._releases_after(result))
 
-		filtered_releases = self.releases_cache[name]
-		if title_filter:
-			pattern = re.compile(title_filter)
-			filtered_releases = [release for release in filtered_releases if pattern.match(release.title)]
+	def get_release_index(self, name: str) -> ReleaseIndex:
+		repository = self._repository_name(name)
+		if repository not in self.release_indexes and self.graphql is not None and repository not in self._graphql_tried:
+			self._resolve_with_graphql()
+		if repository not in self.release_indexes:
+			self._add_release_index(repository, self.github.get_releases(self.get_repo(name).full_name))
+		return self.release_indexes[repository]
 
-		for release in filtered_releases:
-			if include_prerelease or not release.prerelease:
-				return release
-		raise ReleaseNotFoundException(f"No suitable release found for {name}")
+	def get_release(self, name: str):
+		repo_info = self.download_info[name]
+		release = self.get_release_index(name).find(repo_info.get('release_title_filter', None), repo_info.get('include_prerelease', False))
+		if release is None:
+			raise ReleaseNotFoundException(f"No suitable release found for {name}")
+		return release
 
 	def get_asset(self, name: str):
 		release = self.get_release(name)
-		if release.id not in self.assets_cache:
-			self.assets_cache[release.id] = list(release.get_assets())
-
-		assets = self.assets_cache[release.id]
+		# Assets come inline with the release listing, so no extra request is needed here
+		assets = release.assets
 		if not assets:
 			raise AssetNotFoundException("No assets found for the release")
 
@@ -76,48 +172,217 @@ class Downloader:
 					return asset
 		return assets[0]
 
+	def resolve_asset(self, name: str) -> AssetRecord:
+		"""get_asset, safe to call from several threads at once."""
+		try:
+			with self._metadata_lock:
+				return self.get_asset(name)
+		finally:
+			# One write per resolve, however many pages it revalidated
+			self.metadata_cache.save()
+
+	def get_cached_asset(self, name: str) -> Optional[AssetRecord]:
+		"""Ask the cache server for the asset, pointed at its copy, or return None to go to GitHub."""
+		server = self.cache_server
+		if server is None: return None
+		params = {key: (int(value) if isinstance(value, bool) else value) for key, value in component_selection(self.download_info[name]).items() if value is not None}
+		try:
+			response = self.http.session.get(f"{server}/v1/resolve", params=params, timeout=CACHE_SERVER_TIMEOUT)
+			response.raise_for_status()
+			data = response.json()
+			asset = AssetRecord(**data['asset'])
+		except (requests.ConnectionError, requests.Timeout) as e:
+			# Don't make every other component wait for a server that isn't there
+			logger.debug(f"Cache server error: {e}")
+			with self._metadata_lock:
+				if self.cache_server is not None:
+					self.log(f"Cache server {server} is not reachable, downloading from GitHub instead")
+					self.cache_server = None
+			return None
+		except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+			self.log(f"Cache server could not provide {name}, downloading from GitHub instead: {e}")
+			return None
+		return replace(asset, browser_download_url=f"{server}/v1/objects/{data['sha256']}", digest=f"sha256:{data['sha256']}")
+
 	def download_asset(self, name: str):
 		logger.debug(f'Attempting to download {name}')
-		asset = self.get_asset(name)
+		asset = self.get_cached_asset(name)
+		if asset is None:
+			asset = self.resolve_asset(name)
 		filename, ext = os.path.splitext(asset.name)
-		local_file_path = self.download_dir / f"{filename}_{asset.id}{ext}"
+		part_file_path = self.store.partial_path(f"{filename}_{asset.id}{ext}")
+		with self._part_locks_lock:
+			part_lock = self._part_locks.setdefault(part_file_path, threading.Lock())
+		with part_lock:
+			return self._download_to_store(name, asset, part_file_path, ext)
+
+	def _download_to_store(self, name: str, asset: AssetRecord, part_file_path: Path, ext: str):
+		# GitHub publishes "sha256:<hex>" digests for newer assets, which lets us skip re-uploads we already hold
+		published_digest = asset.digest.split(':', 1)[1] if asset.digest and asset.digest.startswith('sha256:') else None
+
+		# Check if the file already exists to avoid re-downloading, including by whoever held the lock before us
+		stored_path = self.store.lookup(asset_id=asset.id, url=asset.browser_download_url, digest=published_digest)
+		if stored_path is not None:
+			self.log(f"File already downloaded: {stored_path}")
+			return stored_path
 
-		# Check if the file already exists to avoid re-downloading
-		if local_file_path.exists():
-			self.log(f"File already downloaded: {local_file_path}")
-			return local_file_path
+		# Files downloaded by older versions sit flat in the download dir; adopt rather than refetch them
+		legacy_file_path = Path(self.download_dir) / part_file_path.stem
+		if legacy_file_path.exists() and not part_file_path.exists():
+			os.replace(legacy_file_path, part_file_path)
 
 		# Download the file
-		self.log(f"Downloading {asset.name} to {local_file_path}")
-		response = requests.get(asset.browser_download_url, stream=True)
-		with open(local_file_path, 'wb') as f:
-			for chunk in response.iter_content(chunk_size=8192):
-				if not self.keep_running: break
-				f.write(chunk)
-		if not self.keep_running and os.path.exists(local_file_path):
-			os.remove(local_file_path)
-			return None
-		return local_file_path
+		self.log(f"Downloading {asset.name}")
+		tracker = ProgressTracker(name, DOWNLOAD, asset.size, self.post_progress)
+		for attempt in range(1, self.download_retries + 1):
+			try:
+				size = self._transfer(asset, part_file_path, tracker)
+				if size is None:
+					# Canceled; the .part file stays behind so the next run can resume it
+					return None
+			except RESUMABLE_ERRORS as e:
+				if attempt == self.download_retries: raise
+				self.log(f"Download of {asset.name} interrupted, resuming: {e}")
+				time.sleep(min(2 ** attempt, DOWNLOAD_TIMEOUT))
+				continue
+			# The metadata's size, or failing that the one the server sent the file with
+			size = asset.size or size
+			received = part_file_path.stat().st_size
+			if not size:
+				if published_digest is not None:
+					# The digest check when it is stored decides whether it is complete
+					break
+				os.remove(part_file_path)
+				raise IncompleteDownloadException(f"Cannot tell whether {asset.name} downloaded completely, as neither its size nor its digest is known")
+			if received == size:
+				break
+			if received > size:
+				os.remove(part_file_path)
+				raise IncompleteDownloadException(f"Received {received} bytes for {asset.name} but expected {size}")
+			# The connection closed early without an error; go around again for the rest
+			logger.debug(f"Got {received} of {size} bytes for {asset.name} on attempt {attempt}")
+		else:
+			raise IncompleteDownloadException(f"Gave up on {asset.name} after {self.download_retries} attempts")
+		tracker.finish()
+		return self.store.add(part_file_path, asset_id=asset.id, url=asset.browser_download_url, expected_digest=published_digest, ext=ext)
+
+	def _transfer(self, asset, part_file_path, tracker) -> Optional[int]:
+		if self.concurrency is None:
+			return self._fetch_to_part_file(asset, part_file_path, tracker)
+		if not self.concurrency.acquire(lambda: self.keep_running): return None
+		try:
+			return self._fetch_to_part_file(asset, part_file_path, tracker)
+		finally:
+			self.concurrency.release()
+
+	def _fetch_to_part_file(self, asset, part_file_path, tracker) -> Optional[int]:
+		"""Append the rest of the asset to its .part file.
+
+		Returns the full size of the file as the server sent it, 0 if the server didn't say,
+		or None if canceled.
+		"""
+		offset = part_file_path.stat().st_size if part_file_path.exists() else 0
+		if asset.size and offset >= asset.size:
+			if offset == asset.size: return asset.size
+			os.remove(part_file_path)
+			offset = 0
+		headers = {'Range': f"bytes={offset}-"} if offset else {}
+		url = self.http.download_target(asset.browser_download_url)
+		started = time.perf_counter()
+		with self.http.session.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as response:
+			if self.concurrency is not None:
+				self.concurrency.record_latency(time.perf_counter() - started)
+			if url != asset.browser_download_url and response.status_code in (400, 403, 404, 410):
+				# The signed CDN link we remembered has expired; go back through GitHub
+				logger.debug(f"Cached download link for {asset.name} was rejected with {response.status_code}")
+				self.http.forget_redirect(asset.browser_download_url)
+				return self._fetch_to_part_file(asset, part_file_path, tracker)
+			self.http.remember_redirect(asset.browser_download_url, response)
+			if response.status_code == 416:
+				# Our partial file doesn't line up with what's on the server any more
+				os.remove(part_file_path)
+				return self._fetch_to_part_file(asset, part_file_path, tracker)
+			response.raise_for_status()
+			content_range = CONTENT_RANGE.fullmatch(response.headers.get('Content-Range', '').strip()) if response.status_code == 206 else None
+			if offset and response.status_code == 206 and (content_range is None or int(content_range.group(1)) != offset):
+				# Appending a range that starts anywhere else would corrupt the file
+				logger.debug(f"Server sent {asset.name} from {response.headers.get('Content-Range')} instead of byte {offset}, starting over")
+				os.remove(part_file_path)
+				return self._fetch_to_part_file(asset, part_file_path, tracker)
+			if offset and response.status_code != 206:
+				logger.debug(f"Server ignored the range request for {asset.name}, starting over")
+				offset = 0
+			elif offset:
+				logger.debug(f"Resuming {asset.name} from byte {offset}")
+			if content_range is not None:
+				size = int(content_range.group(2)) if content_range.group(2) != '*' else 0
+			else:
+				size = int(response.headers['Content-Length']) if response.headers.get('Content-Length', '').isdigit() and 'Content-Encoding' not in response.headers else 0
+			# Bytes already on disk count as done, so resumed transfers report sensible percentages
+			tracker.restart(offset)
+			with open(part_file_path, 'ab' if offset else 'wb') as f:
+				for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+					if not self.keep_running: return None
+					if not self.limiter.consume(len(chunk), lambda: self.keep_running): return None
+					f.write(chunk)
+					tracker.advance(len(chunk))
+					if self.concurrency is not None:
+						self.concurrency.record_bytes(len(chunk))
+		return size
 
 	def log(self, message):
-		wx.CallAfter(wx.PostEvent, self.panel, NotifyEvent(avEVT_NOTIFY, message=message))
+		self.observer.log(message)
+
+	def post_progress(self, progress):
+		self.observer.progress(progress)
+
+	def download_component(self, name: str, data: Dict[str, Any]):
+		logger.debug(f'Downloading {name}')
+		if not self.keep_running: return
+		self.log(f"Downloading {name}...")
+		try:
+			path = self.download_asset(name)
+			if path is None:
+				self.log(f"Download of {name} canceled.")
+			else:
+				self.log(f"Downloaded {name} to \"{path}\"")
+				data['download_path'] = path
+				data['download_digest'] = self.store.digest_for_path(path)
+				if self.on_downloaded is not None:
+					self.on_downloaded(name)
+		except (requests.RequestException, IncompleteDownloadException, ChecksumMismatchException,
+				RepositoryNotFoundException, ReleaseNotFoundException, AssetNotFoundException) as e:
+			# Report it and go on to the next component, as the concurrent path already does
+			self.log(f"Failed to download {name}: {e}")
 
 	def download_all(self):
-		for name, data in self.download_info.items():
-			logger.debug(f'Downloading {name}')
-			if not self.keep_running: return
-			self.log(f"Downloading {name}...")
-			try:
-				path = self.download_asset(name)
-				if path is None:
-					self.log(f"Download of {name} canceled.")
-				else:
-					self.log(f"Downloaded {name} to \"{path}\"")
-					data['download_path'] = path
-			except requests.RequestException as e:
-				self.log(f"Failed to download {name}: {e}")
-		wx.CallAfter(wx.PostEvent, self.panel, DownloadsCompleteEvent(avEVT_DOWNLOADS_COMPLETE))
+		if self.max_workers > 1 and len(self.download_info) > 1:
+			self._download_all_concurrently()
+		else:
+			for name, data in self.download_info.items():
+				if not self.keep_running: return
+				self.download_component(name, data)
+		# Canceled while the last downloads ran; the front end must not go on to install
+		if not self.keep_running: return
+		if self.github.rate_limit is not None:
+			self.log(self.github.rate_limit.describe())
+		self.observer.downloads_complete()
+
+	def _download_all_concurrently(self):
+		workers = min(self.max_workers, len(self.download_info))
+		logger.debug(f'Downloading {len(self.download_info)} components with {workers} workers')
+		with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ASS-download') as executor:
+			futures = {executor.submit(self.download_component, name, data): name for name, data in self.download_info.items()}
+			for future in as_completed(futures):
+				name = futures[future]
+				try:
+					future.result()
+				except Exception as e:
+					# One failing component must not take the others down with it
+					logger.exception(f'Unexpected error downloading {name}')
+					self.log(f"Failed to download {name}: {e}")
 
 	def stop(self):
 		self.keep_running = False
+		self.github.scheduler.canceled.set()
 
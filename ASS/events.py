@@ -16,6 +16,18 @@ class NotifyEvent(wx.PyCommandEvent):
 	def GetMessage(self):
 		return self._message
 
+avEVT_PROGRESS = wx.NewEventType()
+EVT_PROGRESS = wx.PyEventBinder(avEVT_PROGRESS, 1)
+
+class ProgressEvent(wx.PyCommandEvent):
+	def __init__(self, etype, eid=-1, progress=None):
+		super(ProgressEvent, self).__init__(etype, eid)
+		self._progress = progress
+
+	def GetProgress(self):
+		"""The ASS.progress.ProgressUpdate describing component, phase, bytes, rate and ETA."""
+		return self._progress
+
 avEVT_DOWNLOADS_COMPLETE = wx.NewEventType()
 EVT_DOWNLOADS_COMPLETE = wx.PyEventBinder(avEVT_DOWNLOADS_COMPLETE, 1)
 
@@ -30,9 +42,22 @@ class InstallationCompleteEvent(wx.PyCommandEvent):
 	def __init__(self, etype, eid=-1):
 		super(InstallationCompleteEvent, self).__init__(etype, eid)
 
+avEVT_INSTALLATION_FAILED = wx.NewEventType()
+EVT_INSTALLATION_FAILED = wx.PyEventBinder(avEVT_INSTALLATION_FAILED, 1)
+
+class InstallationFailedEvent(wx.PyCommandEvent):
+	def __init__(self, etype, eid=-1, message=None):
+		super(InstallationFailedEvent, self).__init__(etype, eid)
+		self._message = message
+
+	def GetMessage(self):
+		return self._message
+
 # List of symbols to export when using 'from events import *'
 __all__ = (
 	'avEVT_NOTIFY', 'EVT_NOTIFY', 'NotifyEvent',
+	'avEVT_PROGRESS', 'EVT_PROGRESS', 'ProgressEvent',
 	'avEVT_DOWNLOADS_COMPLETE', 'EVT_DOWNLOADS_COMPLETE', 'DownloadsCompleteEvent',
-	'avEVT_INSTALLATION_COMPLETE', 'EVT_INSTALLATION_COMPLETE', 'InstallationCompleteEvent'
+	'avEVT_INSTALLATION_COMPLETE', 'EVT_INSTALLATION_COMPLETE', 'InstallationCompleteEvent',
+	'avEVT_INSTALLATION_FAILED', 'EVT_INSTALLATION_FAILED', 'InstallationFailedEvent'
 )
@@ -2,10 +2,30 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+class AssetNotFoundException(Exception):
+	"""Exception raised when a release has no suitable asset."""
+	pass
+
+class BundleError(Exception):
+	"""Exception raised when an offline bundle cannot be written or does not fit the selected components."""
+	pass
+
+class ChecksumMismatchException(Exception):
+	"""Exception raised when a file's digest differs from the one it was published with."""
+	pass
+
 class DownloadedFileNotFoundException(FileNotFoundError):
 	"""Exception raised when downloaded file is not found."""
 	pass
 
+class IncompleteDownloadException(Exception):
+	"""Exception raised when a download does not match the size given by its asset."""
+	pass
+
+class ModConflictException(Exception):
+	"""Exception raised when two components ship different versions of the same file."""
+	pass
+
 class ReleaseNotFoundException(Exception):
 	"""Exception raised when no suitable release is found."""
 	pass
@@ -22,11 +42,21 @@ class UnsupportedOSError(OSError):
 	"""Exception raised when running on an OS not supported by SDV / SMAPI."""
 	pass
 
+class VDFError(ValueError):
+	"""Exception raised when a Steam .vdf file cannot be parsed."""
+	pass
+
 
 __all__ = (
+	"AssetNotFoundException",
+	"BundleError",
+	"ChecksumMismatchException",
 	"DownloadedFileNotFoundException",
+	"IncompleteDownloadException",
+	"ModConflictException",
 	"ReleaseNotFoundException",
 	"RepositoryConfigurationError",
 	"RepositoryNotFoundException",
-	"UnsupportedOSError"
+	"UnsupportedOSError",
+	"VDFError"
 )
\ No newline at end of file
@@ -0,0 +1,216 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from ASS import vdf
+from ASS.exceptions import VDFError
+
+logger = logging.getLogger(__name__)
+
+STEAM_APP_ID = "413150"
+GOG_GAME_ID = "1453375253"
+# Where Steam keeps its own files, not necessarily where it installs games
+STEAM_ROOTS = {
+	'windows': [os.path.expandvars(r"%ProgramFiles(x86)%\Steam"), os.path.expandvars(r"%ProgramFiles%\Steam")],
+	'linux': [
+		"~/.local/share/Steam",
+		"~/.steam/steam",
+		# Flatpak and Snap installs of Steam
+		"~/.var/app/com.valvesoftware.Steam/.local/share/Steam",
+		"~/snap/steam/common/.local/share/Steam"
+	],
+	'macOS': ["~/Library/Application Support/Steam"]
+}
+GOG_PATHS = {
+	'windows': [],
+	'linux': ["~/GOG Games/Stardew Valley/game"],
+	'macOS': []
+}
+PROBE_WORKERS = 8
+# Long enough to cover a burst of keystrokes, short enough to notice a game installed meanwhile
+VALIDATION_TTL = 10.0
+
+def executable_name(platform: str) -> str:
+	return "Stardew Valley.exe" if platform == 'windows' else "Stardew Valley"
+
+def normalize(path: str) -> str:
+	return os.path.normpath(os.path.expanduser(path.strip())) if path.strip() else ""
+
+def _registry_value(key: str, name: str) -> Optional[str]:
+	try:
+		import winreg
+	except ImportError:
+		return None
+	for hive in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+		try:
+			with winreg.OpenKey(hive, key) as handle:
+				return str(winreg.QueryValueEx(handle, name)[0])
+		except OSError:
+			continue
+	return None
+
+def steam_roots(platform: str) -> List[str]:
+	roots = [os.path.expanduser(root) for root in STEAM_ROOTS.get(platform, [])]
+	if platform == 'windows':
+		for key, name in ((r"Software\Valve\Steam", "SteamPath"), (r"SOFTWARE\WOW6432Node\Valve\Steam", "InstallPath")):
+			root = _registry_value(key, name)
+			if root: roots.insert(0, os.path.normpath(root))
+	return list(dict.fromkeys(roots))
+
+def library_folders(path: str) -> List[str]:
+	"""Library paths from a libraryfolders.vdf, those listing Stardew Valley first."""
+	with open(path, encoding='utf-8', errors='replace') as f:
+		data = vdf.parse(f.read())
+	# Older files have no "path" blocks and list libraries as "1" "D:\\Games\\Steam"
+	folders = next(iter(data.values()), {}) if data else {}
+	with_game, without_game = [], []
+	for key, entry in folders.items():
+		if isinstance(entry, dict) and 'path' in entry:
+			(with_game if STEAM_APP_ID in entry.get('apps', {}) else without_game).append(entry['path'])
+		elif isinstance(entry, str) and key.isdigit():
+			without_game.append(entry)
+	return with_game + without_game
+
+def _game_dir(library: str, platform: str) -> str:
+	game_dir = os.path.join(library, "steamapps", "common", "Stardew Valley")
+	return os.path.join(game_dir, "Contents", "MacOS") if platform == 'macOS' else game_dir
+
+class PathValidator:
+	"""Remembers which folders hold the game for a few seconds, so repeated checks don't touch the disk."""
+	def __init__(self, platform: str, ttl: float=VALIDATION_TTL):
+		self.executable = executable_name(platform)
+		self.ttl = ttl
+		self._results = {}
+		self._lock = threading.Lock()
+
+	def cached(self, path: str) -> Optional[bool]:
+		"""The remembered answer for path, or None if it has to be checked."""
+		path = normalize(path)
+		if not path: return False
+		with self._lock:
+			valid, checked = self._results.get(path, (None, 0))
+		return valid if time.monotonic() - checked < self.ttl else None
+
+	def check(self, path: str) -> bool:
+		valid = self.cached(path)
+		if valid is not None: return valid
+		path = normalize(path)
+		valid = os.path.isdir(path) and os.path.isfile(os.path.join(path, self.executable))
+		with self._lock:
+			self._results[path] = (valid, time.monotonic())
+		return valid
+
+class GameDiscovery:
+	"""Finds Stardew Valley installs in the configured paths, every Steam library, and GOG's usual places.
+
+	Candidates are checked in parallel on a background thread. What was found is kept in
+	cache_path together with the modification times of the Steam files it came from, so the
+	next run only looks again if a library was added or moved, or a found game is gone.
+	"""
+	def __init__(self, platform: str, configured_paths: Iterable[str], cache_path: Optional[str]=None, validator: Optional[PathValidator]=None):
+		self.platform = platform
+		self.configured_paths = [normalize(path) for path in configured_paths]
+		self.cache_path = cache_path
+		self.validator = validator if validator is not None else PathValidator(platform)
+		self._future = None
+		self._lock = threading.Lock()
+
+	def _library_files(self) -> List[str]:
+		files = []
+		for root in steam_roots(self.platform):
+			files += [os.path.join(root, "steamapps", "libraryfolders.vdf"), os.path.join(root, "config", "libraryfolders.vdf")]
+		return files
+
+	def _sources(self) -> Dict[str, Optional[float]]:
+		sources = {}
+		for path in self._library_files():
+			try:
+				sources[path] = os.path.getmtime(path)
+			except OSError:
+				sources[path] = None
+		return sources
+
+	def candidates(self, sources: Dict[str, Optional[float]]) -> List[str]:
+		candidates = list(self.configured_paths)
+		for path, mtime in sources.items():
+			if mtime is None: continue
+			try:
+				libraries = library_folders(path)
+			except (OSError, VDFError) as e:
+				logger.debug(f"Could not read Steam libraries from {path}: {e}")
+				continue
+			candidates += [_game_dir(os.path.expanduser(library), self.platform) for library in libraries]
+		for root in steam_roots(self.platform):
+			candidates.append(_game_dir(root, self.platform))
+		gog_path = _registry_value(rf"SOFTWARE\WOW6432Node\GOG.com\Games\{GOG_GAME_ID}", "path") if self.platform == 'windows' else None
+		if gog_path: candidates.append(gog_path)
+		candidates += GOG_PATHS.get(self.platform, [])
+		# The same library is often listed under several spellings
+		return list(dict.fromkeys(normalize(candidate) for candidate in candidates))
+
+	def _cache_key(self, sources) -> Dict[str, object]:
+		return {'platform': self.platform, 'configured': self.configured_paths, 'sources': sources}
+
+	def _load_cached(self, key) -> Optional[List[str]]:
+		if self.cache_path is None: return None
+		try:
+			with open(self.cache_path, encoding='utf-8') as f:
+				cached = json.load(f)
+		except (OSError, ValueError):
+			return None
+		if cached.get('key') != key: return None
+		found = cached.get('found', [])
+		# Nothing found last time can't be checked, and the game may have been installed since
+		if not found: return None
+		# A game uninstalled since, or a drive that isn't plugged in, means looking again
+		if not all(self.validator.check(path) for path in found): return None
+		return found
+
+	def _save(self, key, found: List[str]):
+		if self.cache_path is None: return
+		temp_path = f"{self.cache_path}.tmp"
+		try:
+			with open(temp_path, 'w', encoding='utf-8') as f:
+				json.dump({'key': key, 'found': found}, f, indent=1)
+			os.replace(temp_path, self.cache_path)
+		except OSError as e:
+			logger.debug(f"Could not save found game locations: {e}")
+
+	def discover(self) -> List[str]:
+		"""Every folder holding the game, configured paths first; blocks while probing."""
+		started = time.perf_counter()
+		sources = self._sources()
+		key = self._cache_key(sources)
+		found = self._load_cached(key)
+		if found is None:
+			candidates = self.candidates(sources)
+			# Stat calls on network or sleeping drives can take seconds each; don't queue them up
+			with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, max(1, len(candidates))), thread_name_prefix='ASS-probe') as executor:
+				results = list(executor.map(self.validator.check, candidates))
+			found = [candidate for candidate, valid in zip(candidates, results) if valid]
+			if found: self._save(key, found)
+		logger.debug(f"Found Stardew Valley in {found} in {(time.perf_counter() - started) * 1000:.0f} ms")
+		return found
+
+	def start(self) -> Future:
+		"""Run discover on a background thread, once; the returned future holds its result."""
+		with self._lock:
+			if self._future is None:
+				self._future = Future()
+				threading.Thread(target=self._run, args=(self._future,), name='ASS-discovery', daemon=True).start()
+			return self._future
+
+	def _run(self, future: Future):
+		try:
+			future.set_result(self.discover())
+		except Exception as e:
+			logger.exception("Looking for Stardew Valley failed")
+			future.set_exception(e)
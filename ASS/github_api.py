@@ -0,0 +1,149 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from dataclasses import asdict, dataclass, field
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from github.Auth import Token
+from github.Requester import Requester
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from ASS.exceptions import RepositoryNotFoundException
+from ASS.metadata_cache import MetadataCache
+from ASS.rate_limit import RateLimitScheduler, RateLimitStatus
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://api.github.com"
+REQUEST_TIMEOUT = 30
+USER_AGENT = "AccessibleStardewSetup"
+
+@dataclass
+class AssetRecord:
+	id: int
+	name: str
+	size: int
+	browser_download_url: str
+	updated_at: Optional[str] = None
+	digest: Optional[str] = None
+
+	@classmethod
+	def from_json(cls, data: Dict[str, Any]):
+		return cls(id=data['id'], name=data['name'], size=data.get('size', 0), browser_download_url=data['browser_download_url'], updated_at=data.get('updated_at'), digest=data.get('digest'))
+
+@dataclass
+class ReleaseRecord:
+	id: int
+	title: str
+	tag_name: str
+	prerelease: bool
+	assets: List[AssetRecord] = field(default_factory=list)
+
+	@classmethod
+	def from_json(cls, data: Dict[str, Any]):
+		return cls(id=data['id'], title=data.get('name') or '', tag_name=data.get('tag_name', ''), prerelease=data.get('prerelease', False), assets=[AssetRecord.from_json(asset) for asset in data.get('assets', [])])
+
+	@classmethod
+	def from_record(cls, record: Dict[str, Any]):
+		return cls(**{**record, 'assets': [AssetRecord(**asset) for asset in record.get('assets', [])]})
+
+@dataclass
+class RepositoryRecord:
+	id: int
+	full_name: str
+
+	@classmethod
+	def from_json(cls, data: Dict[str, Any]):
+		return cls(id=data['id'], full_name=data['full_name'])
+
+class GitHubAPI:
+	"""Cached access to the handful of GitHub REST calls the Downloader makes.
+
+	Requests are made by PyGithub's Requester. Its responses are reduced to compact records
+	and kept in a MetadataCache, then revalidated with If-None-Match / If-Modified-Since, so
+	unchanged metadata costs a bodiless 304. Requests go through a RateLimitScheduler, which
+	waits out the rate limit rather than failing on it.
+	"""
+	def __init__(self, token: Optional[str]=None, cache: Optional[MetadataCache]=None, base_url: str=API_URL, per_page: int=30, scheduler: Optional[RateLimitScheduler]=None):
+		self.base_url = base_url.rstrip('/')
+		self.per_page = per_page
+		self.cache = cache if cache is not None else MetadataCache()
+		self.scheduler = scheduler if scheduler is not None else RateLimitScheduler()
+		# Pacing and retries are left to the scheduler, which knows about the rate limit budget
+		self.requester = Requester(auth=Token(token) if token else None, base_url=self.base_url, timeout=REQUEST_TIMEOUT, user_agent=USER_AGENT,
+			per_page=per_page, verify=True, retry=None, pool_size=None, seconds_between_requests=None, seconds_between_writes=None)
+		# The Requester shares one connection object whose request state isn't thread safe
+		self._request_lock = threading.Lock()
+		self.headers = {'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}
+		# Counters are handy when checking how well the cache is doing
+		self.request_count = 0
+		self.not_modified_count = 0
+
+	def _get(self, url: str, headers: Dict[str, str]) -> requests.Response:
+		"""GET url through PyGithub, as a Response the scheduler and the record builders can read."""
+		with self._request_lock:
+			status, response_headers, body = self.requester.requestJson('GET', url, headers=headers)
+		response = requests.Response()
+		response.status_code = status
+		response.headers = CaseInsensitiveDict(response_headers)
+		response.url = url
+		response._content = (body or '').encode('utf-8')
+		return response
+
+	def _get_cached(self, url: str, compact: Callable[[requests.Response], Any]) -> Any:
+		entry = self.cache.get(url)
+		if entry is not None and self.cache.is_fresh(entry):
+			return entry['data']
+		headers = dict(self.headers)
+		if entry is not None:
+			if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+			if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+		response = self.scheduler.send(lambda: self._get(url, headers))
+		self.request_count += 1
+		if response.status_code == 304 and entry is not None:
+			logger.debug(f"Metadata for {url} not modified")
+			self.not_modified_count += 1
+			self.cache.touch(url)
+			return entry['data']
+		response.raise_for_status()
+		data = compact(response)
+		self.cache.put(url, data, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'))
+		return data
+
+	@property
+	def rate_limit(self) -> Optional[RateLimitStatus]:
+		"""The budget as of the last response, or None before the first request."""
+		return self.scheduler.status
+
+	def get_repo(self, full_name: str) -> RepositoryRecord:
+		try:
+			data = self._get_cached(f"{self.base_url}/repos/{full_name}", lambda response: asdict(RepositoryRecord.from_json(response.json())))
+		except requests.HTTPError as e:
+			if e.response is not None and e.response.status_code == 404:
+				raise RepositoryNotFoundException(f"Repository {full_name} does not exist") from e
+			raise
+		return RepositoryRecord(**data)
+
+	@staticmethod
+	def _compact_release_page(response: requests.Response) -> Dict[str, Any]:
+		return {
+			'releases': [asdict(ReleaseRecord.from_json(release)) for release in response.json()],
+			'next': response.links.get('next', {}).get('url')
+		}
+
+	def get_releases(self, full_name: str, skip: int=0) -> Iterator[ReleaseRecord]:
+		"""Yield releases newest first after the first skip, fetching each page only when the previous one is used up."""
+		first_page, skip = divmod(skip, self.per_page)
+		url = f"{self.base_url}/repos/{full_name}/releases?per_page={self.per_page}"
+		if first_page:
+			url += f"&page={first_page + 1}"
+		while url:
+			page = self._get_cached(url, self._compact_release_page)
+			for release in page['releases'][skip:]:
+				yield ReleaseRecord.from_record(release)
+			skip = 0
+			url = page['next']
@@ -0,0 +1,101 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from dataclasses import dataclass
+import logging
+import requests
+from typing import Any, Dict, Iterable, List, Optional
+
+from ASS.github_api import API_URL, REQUEST_TIMEOUT, AssetRecord, ReleaseRecord, RepositoryRecord
+from ASS.rate_limit import RateLimitScheduler
+
+logger = logging.getLogger(__name__)
+
+# Enough to cover every component's latest release in the repositories we install from
+DEFAULT_RELEASES_PER_REPOSITORY = 30
+MAX_ASSETS_PER_RELEASE = 20
+
+RELEASE_FIELDS = """
+			databaseId
+			name
+			tagName
+			isPrerelease
+			releaseAssets(first: $assets) {
+				nodes { id name size downloadUrl updatedAt }
+			}"""
+
+@dataclass
+class RepositoryReleases:
+	repository: RepositoryRecord
+	# Newest first, as the REST API lists them
+	releases: List[ReleaseRecord]
+	# False if the repository has older releases than the ones fetched
+	complete: bool
+
+class GraphQLError(Exception):
+	pass
+
+def build_query(count: int) -> str:
+	"""One query with an aliased repository lookup per repository, r0 to r{count - 1}."""
+	variables = ", ".join(f"$owner{i}: String!, $name{i}: String!" for i in range(count))
+	lookups = "".join(f"""
+	r{i}: repository(owner: $owner{i}, name: $name{i}) {{
+		databaseId
+		nameWithOwner
+		releases(first: $releases, orderBy: {{field: CREATED_AT, direction: DESC}}) {{
+			pageInfo {{ hasNextPage }}
+			nodes {{{RELEASE_FIELDS}
+			}}
+		}}
+	}}""" for i in range(count))
+	return f"query({variables}, $releases: Int!, $assets: Int!) {{{lookups}\n}}"
+
+def _release(node: Dict[str, Any]) -> ReleaseRecord:
+	# GraphQL only exposes an asset's node ID, which the download store accepts as readily as the numeric one
+	assets = [AssetRecord(id=asset['id'], name=asset['name'], size=asset.get('size') or 0, browser_download_url=asset['downloadUrl'], updated_at=asset.get('updatedAt'))
+		for asset in node['releaseAssets']['nodes']]
+	return ReleaseRecord(id=node['databaseId'], title=node.get('name') or '', tag_name=node.get('tagName') or '', prerelease=node.get('isPrerelease', False), assets=assets)
+
+class GitHubGraphQL:
+	"""Resolves the releases of several repositories in a single GraphQL request.
+
+	GitHub only answers GraphQL for authenticated requests, so this needs a token; without
+	one the Downloader stays on the REST client.
+	"""
+	def __init__(self, token: str, base_url: str=API_URL, session: Optional[requests.Session]=None, scheduler: Optional[RateLimitScheduler]=None, releases_per_repository: int=DEFAULT_RELEASES_PER_REPOSITORY):
+		self.url = f"{base_url.rstrip('/')}/graphql"
+		self.session = session if session is not None else requests.Session()
+		self.scheduler = scheduler if scheduler is not None else RateLimitScheduler()
+		self.headers = {'Authorization': f"Bearer {token}"}
+		self.releases_per_repository = releases_per_repository
+		self.request_count = 0
+
+	def fetch_releases(self, repositories: Iterable[str]) -> Dict[str, Optional[RepositoryReleases]]:
+		"""Look up every repository at once; ones GitHub doesn't know map to None."""
+		repositories = list(dict.fromkeys(repositories))
+		variables = {'releases': self.releases_per_repository, 'assets': MAX_ASSETS_PER_RELEASE}
+		for i, repository in enumerate(repositories):
+			variables[f"owner{i}"], variables[f"name{i}"] = repository.split('/', 1)
+		query = {'query': build_query(len(repositories)), 'variables': variables}
+		response = self.scheduler.send(lambda: self.session.post(self.url, json=query, headers=self.headers, timeout=REQUEST_TIMEOUT))
+		self.request_count += 1
+		response.raise_for_status()
+		body = response.json()
+		data = body.get('data') or {}
+		# Unknown repositories come back as NOT_FOUND errors next to the data for the rest
+		errors = [error for error in body.get('errors') or [] if error.get('type') != 'NOT_FOUND']
+		if errors or not data:
+			raise GraphQLError("; ".join(error.get('message', str(error)) for error in errors) or "Empty GraphQL response")
+		results = {}
+		for i, repository in enumerate(repositories):
+			node = data.get(f"r{i}")
+			if node is None:
+				results[repository] = None
+				continue
+			releases = node['releases']
+			results[repository] = RepositoryReleases(
+				RepositoryRecord(id=node['databaseId'], full_name=node['nameWithOwner']),
+				[_release(release) for release in releases['nodes']],
+				complete=not releases['pageInfo']['hasNextPage'])
+		return results
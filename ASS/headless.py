@@ -0,0 +1,170 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+import logging
+import math
+import os
+from pathlib import Path
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from ASS.download_store import DownloadStore
+from ASS.downloader import DOWNLOAD_STORE_DIRNAME, Downloader
+from ASS.exceptions import DownloadedFileNotFoundException
+from ASS.installer import Installer
+from ASS.metadata_cache import DEFAULT_TTL
+from ASS.observer import InstallObserver
+
+logger = logging.getLogger(__name__)
+
+INSTALLER_FILENAME = "data/installer.json"
+
+def load_installer_config(path: str=INSTALLER_FILENAME) -> Dict[str, Any]:
+	if not os.path.exists(path):
+		raise FileNotFoundError(f"Could not load {os.path.abspath(path)}")
+	with open(path, encoding="utf-8") as f:
+		return json.load(f)
+
+def component_info(download_info: Dict[str, Any]) -> Dict[str, Any]:
+	"""download_info keyed by plain component names, without the hotkey markers the GUI uses."""
+	return {k.replace('&', ''):v for k, v in download_info.items() if isinstance(v, dict)}
+
+def _flag(value: Optional[str], default: bool) -> bool:
+	"""An on/off environment variable, falling back to default when unset."""
+	if not value: return default
+	return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def _bandwidth_limit(settings: Dict[str, Any]) -> float:
+	"""The download bandwidth limit in bytes per second, 0 for none.
+
+	A value that isn't a non-negative number is logged and skipped, so a typo means no limit
+	rather than an installer that won't start.
+	"""
+	for name, value in (('ASS_BANDWIDTH_LIMIT_MBPS', os.environ.get('ASS_BANDWIDTH_LIMIT_MBPS')), ('download_bandwidth_limit_mbps', settings.get('download_bandwidth_limit_mbps'))):
+		if value is None or value == '': continue
+		try:
+			mbps = float(value)
+		except (TypeError, ValueError):
+			mbps = -1
+		if math.isfinite(mbps) and mbps >= 0:
+			return mbps * 1e6 / 8
+		logger.warning(f"Ignoring {name}={value!r}; expected a number of megabits per second")
+	return 0
+
+def release_resolver(settings: Dict[str, Any]) -> str:
+	"""'graphql' or 'rest'; GraphQL is only used when a token is set."""
+	return os.environ.get('ASS_RELEASE_RESOLVER') or settings.get('release_resolver', 'rest')
+
+def downloader_options(settings: Dict[str, Any]) -> Dict[str, Any]:
+	"""Keyword arguments for Downloader from the settings block of data/installer.json."""
+	return dict(
+		max_workers=settings.get('download_workers', 1),
+		metadata_ttl=settings.get('metadata_ttl', DEFAULT_TTL),
+		download_retries=settings.get('download_retries', 5),
+		store_budget=settings.get('download_store_budget_mb', 256) * 1024 * 1024,
+		# Lets a whole room of machines be pointed at one cache server without editing installer.json
+		cache_server=os.environ.get('ASS_CACHE_SERVER') or settings.get('cache_server'),
+		# Megabits per second, like the figure an ISP or school network admin quotes; 0 for no limit
+		bandwidth_limit=_bandwidth_limit(settings),
+		adaptive_concurrency=_flag(os.environ.get('ASS_ADAPTIVE_DOWNLOADS'), settings.get('adaptive_download_workers', False)),
+		resolver=release_resolver(settings))
+
+def installer_options(settings: Dict[str, Any]) -> Dict[str, Any]:
+	"""Keyword arguments for Installer from the settings block of data/installer.json."""
+	return dict(
+		extract_workers=settings.get('extract_workers', 1),
+		atomic_staging=settings.get('atomic_staging', False),
+		incremental=settings.get('incremental_install', False),
+		remove_stale=settings.get('remove_stale_files', False),
+		transactional=settings.get('transactional_install', False),
+		spool_threshold=settings.get('spool_threshold_mb', 64) * 1024 * 1024)
+
+def select_variants(download_info: Dict[str, Any], variants: Iterable[str]=(), prereleases: Iterable[str]=()):
+	"""Apply the choices the component selection panel would otherwise make."""
+	for name in variants:
+		if name not in download_info or 'asset_selector' not in download_info[name]:
+			raise ValueError(f"{name} has no alternative build to choose")
+		download_info[name]['asset_selector']['match'] = True
+	for name in prereleases:
+		if name not in download_info or not download_info[name].get('offer_prerelease', False):
+			raise ValueError(f"{name} does not offer prereleases")
+		download_info[name]['include_prerelease'] = True
+
+def validate_game_dir(sdv_dir: str):
+	if not os.path.isdir(sdv_dir):
+		raise NotADirectoryError(f"{sdv_dir} is not a directory")
+	# SMAPI's install copies this, so without it the install would fail halfway through
+	if not os.path.exists(os.path.join(sdv_dir, "Stardew Valley.deps.json")):
+		raise FileNotFoundError(f"{sdv_dir} does not look like a Stardew Valley folder")
+
+def _check_downloaded(download_info: Dict[str, Any]):
+	missing = [name for name, info in download_info.items() if 'download_path' not in info]
+	if missing:
+		raise DownloadedFileNotFoundException(f"These components could not be downloaded: {', '.join(missing)}")
+
+def fetch(download_info: Dict[str, Any], settings: Dict[str, Any], app_dir: str, observer: InstallObserver, token: Optional[str]=None, bundle: Optional[str]=None) -> DownloadStore:
+	"""Get every component into the download store, from GitHub or, with no network access, from a bundle."""
+	if bundle is not None:
+		from ASS.bundle import Bundle
+		store = DownloadStore(Path(app_dir) / DOWNLOAD_STORE_DIRNAME, budget=downloader_options(settings)['store_budget'])
+		with Bundle(bundle) as source:
+			source.load_into(download_info, store, observer)
+		return store
+	downloader = Downloader(download_info, token=token, download_dir=app_dir, observer=observer, **downloader_options(settings))
+	downloader.download_all()
+	_check_downloaded(download_info)
+	return downloader.store
+
+def export_bundle(download_info: Dict[str, Any], settings: Dict[str, Any], app_dir: str, observer: InstallObserver, path: str, token: Optional[str]=None):
+	"""Download every component and write them, with their release metadata, to a bundle at path."""
+	from ASS.bundle import write_bundle
+	downloader = Downloader(download_info, token=token, download_dir=app_dir, observer=observer, **downloader_options(settings))
+	downloader.download_all()
+	_check_downloaded(download_info)
+	write_bundle(path, download_info, downloader, observer)
+	observer.log(f"Wrote {len(download_info)} components to {path}")
+
+def install(download_info: Dict[str, Any], settings: Dict[str, Any], sdv_dir: str, app_dir: str, observer: InstallObserver, token: Optional[str]=None, platform: Optional[str]=None, bundle: Optional[str]=None):
+	"""Download and install every component in download_info without a GUI, blocking until done.
+
+	Runs the same engine as the download panel, including pipelined installs, and raises
+	whatever the installer raised so callers can report failure. With a bundle nothing is
+	downloaded; the payloads are verified and taken from the bundle instead.
+	"""
+	validate_game_dir(sdv_dir)
+	if bundle is not None:
+		store = fetch(download_info, settings, app_dir, observer, bundle=bundle)
+		with Installer(download_info, sdv_dir, store=store, observer=observer, platform=platform, **installer_options(settings)) as installer:
+			installer.install_all()
+		return
+	pipelined = settings.get('pipelined_install', False)
+	installer = None
+	downloader = Downloader(download_info, token=token, download_dir=app_dir, observer=observer,
+		on_downloaded=lambda name: installer.enqueue(name) if pipelined else None,
+		**downloader_options(settings))
+	installer = Installer(download_info, sdv_dir, store=downloader.store, observer=observer, platform=platform, **installer_options(settings))
+	with installer:
+		if not pipelined:
+			downloader.download_all()
+			installer.install_all()
+			return
+		errors = []
+		def run_installer():
+			try:
+				installer.install_pipelined()
+			except Exception as e:
+				errors.append(e)
+		install_thread = threading.Thread(target=run_installer, name='ASS-install', daemon=True)
+		install_thread.start()
+		try:
+			downloader.download_all()
+		except BaseException:
+			installer.stop()
+			raise
+		finally:
+			installer.finish_queue()
+			install_thread.join()
+		if errors:
+			raise errors[0]
@@ -0,0 +1,76 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+import time
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 6
+# Signed CDN links behind browser_download_url expire after five minutes
+REDIRECT_TTL = 4 * 60
+PREWARM_TIMEOUT = 10
+PREWARM_INTERVAL = 30
+API_HOST = "https://api.github.com"
+DOWNLOAD_HOSTS = ("https://github.com", "https://release-assets.githubusercontent.com", "https://objects.githubusercontent.com")
+
+class HTTPSession:
+	"""One keep-alive connection pool shared by GraphQL release lookups and asset downloads.
+
+	REST release lookups go through PyGithub, which keeps its own connection to the API host.
+
+	Also remembers where each browser_download_url redirects to, so resumed or retried
+	transfers go straight to the CDN, and can open connections ahead of time.
+	"""
+	def __init__(self, pool_size: int=DEFAULT_POOL_SIZE):
+		self.pool_size = max(1, pool_size)
+		self.session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=len(DOWNLOAD_HOSTS) + 1, pool_maxsize=self.pool_size)
+		self.session.mount('https://', adapter)
+		self.session.mount('http://', adapter)
+		self._redirects = {}
+		self._lock = threading.Lock()
+		self._last_prewarm = 0
+
+	def download_target(self, url: str) -> str:
+		"""Return the cached redirect target for url if it is still valid, else url itself."""
+		with self._lock:
+			target, expires = self._redirects.get(url, (None, 0))
+		return target if target is not None and expires > time.monotonic() else url
+
+	def remember_redirect(self, url: str, response: requests.Response):
+		if response.history and response.url != url:
+			with self._lock:
+				self._redirects[url] = (response.url, time.monotonic() + REDIRECT_TTL)
+
+	def forget_redirect(self, url: str):
+		with self._lock:
+			self._redirects.pop(url, None)
+
+	def _open_connection(self, host: str):
+		try:
+			self.session.head(host, timeout=PREWARM_TIMEOUT, allow_redirects=False)
+		except requests.RequestException as e:
+			logger.debug(f"Could not prewarm connection to {host}: {e}")
+
+	def prewarm(self, download_connections: Optional[int]=None, hosts: Iterable[str]=DOWNLOAD_HOSTS, api: bool=False):
+		"""Complete TCP and TLS handshakes now so the first real requests skip them.
+
+		Only pass api when releases are looked up over GraphQL; a connection to the API host in
+		this pool is wasted on REST lookups.
+		"""
+		if time.monotonic() - self._last_prewarm < PREWARM_INTERVAL: return
+		self._last_prewarm = time.monotonic()
+		connections = min(download_connections or self.pool_size, self.pool_size)
+		targets = ([API_HOST] if api else []) + [host for host in hosts for _ in range(connections)]
+		started = time.perf_counter()
+		# Connections only land in the pool in parallel if they are opened in parallel
+		with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix='ASS-prewarm') as executor:
+			list(executor.map(self._open_connection, targets))
+		logger.debug(f"Prewarmed {len(targets)} connections in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,84 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+import logging
+import os
+from typing import Callable, Dict, Iterable, List, Tuple
+import zipfile
+import zlib
+
+logger = logging.getLogger(__name__)
+
+CRC_CHUNK_SIZE = 1024 * 1024
+MANIFEST_FILENAME = ".ass-manifest.json"
+
+def file_crc32(path: str) -> int:
+	crc = 0
+	with open(path, 'rb') as f:
+		for chunk in iter(lambda: f.read(CRC_CHUNK_SIZE), b''):
+			crc = zlib.crc32(chunk, crc)
+	return crc
+
+def is_member_current(info: zipfile.ZipInfo, installed_root: str) -> bool:
+	"""True if installed_root already holds this member with the same size and CRC32."""
+	path = os.path.join(installed_root, info.filename)
+	try:
+		if os.path.getsize(path) != info.file_size: return False
+	except OSError:
+		return False
+	# Only read the installed file when the cheap size check could not tell them apart
+	return file_crc32(path) == info.CRC
+
+def changed_members(archive: zipfile.ZipFile, installed_root: str) -> Tuple[List[zipfile.ZipInfo], int]:
+	"""Split an archive into the members that need writing and a count of those already in place.
+
+	Directory entries are always returned since creating them costs nothing.
+	"""
+	changed = []
+	unchanged = 0
+	for info in archive.infolist():
+		if info.is_dir() or not is_member_current(info, installed_root):
+			changed.append(info)
+		else:
+			unchanged += 1
+	return changed, unchanged
+
+def file_members(archive: zipfile.ZipFile, prefix: str='') -> List[str]:
+	"""Paths of every file in the archive, relative to the game directory once installed under prefix."""
+	return [f"{prefix}{info.filename}" for info in archive.infolist() if not info.is_dir()]
+
+class InstallManifest:
+	"""Remembers which files each component installed so files dropped by a new release can be found."""
+	def __init__(self, sdv_dir: str):
+		self.sdv_dir = sdv_dir
+		self.path = os.path.join(sdv_dir, MANIFEST_FILENAME)
+		self.components: Dict[str, List[str]] = {}
+		if os.path.exists(self.path):
+			try:
+				with open(self.path, encoding='utf-8') as f:
+					self.components = json.load(f).get('components', {})
+			except (OSError, ValueError) as e:
+				logger.warning(f"Ignoring unreadable install manifest {self.path}: {e}")
+
+	def stale_files(self, name: str, files: Iterable[str]) -> List[str]:
+		return sorted(set(self.components.get(name, [])) - set(files))
+
+	def remove_stale(self, name: str, files: Iterable[str], remove: Callable[[str], None]=os.remove) -> List[str]:
+		removed = []
+		for relative_path in self.stale_files(name, files):
+			path = os.path.join(self.sdv_dir, relative_path)
+			if os.path.isfile(path):
+				remove(path)
+				removed.append(relative_path)
+		return removed
+
+	def update(self, name: str, files: Iterable[str]):
+		self.components[name] = sorted(files)
+
+	def save(self):
+		temp_path = f"{self.path}.tmp"
+		with open(temp_path, 'w', encoding='utf-8') as f:
+			json.dump({'components': self.components}, f, indent=1)
+		os.replace(temp_path, self.path)
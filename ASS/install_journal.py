@@ -0,0 +1,113 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+CREATED = "created"
+REPLACED = "replaced"
+# Where backups a rollback could not restore are kept; unlike staging areas these are never cleaned up
+ROLLBACK_PREFIX = ".ass-rollback-"
+
+class InstallJournal:
+	"""Rollback journal for an install into the game directory.
+
+	record() must be called before a path is written. An existing file or folder is moved into
+	the journal's backup directory by rename, and paths that did not exist yet are noted so they
+	can be moved out again. Keeping the backup directory on the game's filesystem makes both
+	recording and rolling back cost one rename per touched path, however large the path is.
+	"""
+	def __init__(self, backup_dir: str):
+		self.backup_dir = backup_dir
+		self.discard_dir = os.path.join(backup_dir, "discarded")
+		os.makedirs(self.discard_dir, exist_ok=True)
+		self._entries = []
+		self._recorded = set()
+		self._lock = threading.Lock()
+		# Paths the last rollback could not restore; their backups are still in backup_dir
+		self.failed = []
+
+	def __len__(self):
+		return len(self._entries)
+
+	def _move(self, source, destination):
+		try:
+			os.rename(source, destination)
+		except OSError:
+			# Only when the backup dir ended up on another filesystem
+			shutil.move(source, destination)
+
+	def _record_missing_parents(self, path):
+		missing = []
+		parent = os.path.dirname(path)
+		while parent and not os.path.exists(parent):
+			missing.append(parent)
+			parent = os.path.dirname(parent)
+		for directory in reversed(missing):
+			if directory not in self._recorded:
+				self._recorded.add(directory)
+				self._entries.append((CREATED, directory, None))
+
+	def record(self, path: str):
+		"""Note that path is about to be written, moving whatever is there now out of the way."""
+		path = os.path.abspath(path)
+		with self._lock:
+			if path in self._recorded: return
+			self._record_missing_parents(path)
+			self._recorded.add(path)
+			if os.path.lexists(path):
+				backup = os.path.join(self.backup_dir, str(len(self._entries)))
+				self._move(path, backup)
+				self._entries.append((REPLACED, path, backup))
+			else:
+				self._entries.append((CREATED, path, None))
+
+	def rollback(self) -> int:
+		"""Undo every recorded change, newest first, returning how many paths were restored."""
+		with self._lock:
+			entries, self._entries = self._entries, []
+			self._recorded.clear()
+		self.failed = []
+		for action, path, backup in reversed(entries):
+			try:
+				if os.path.lexists(path):
+					if action == CREATED and os.path.isdir(path) and not os.listdir(path):
+						os.rmdir(path)
+					else:
+						self._move(path, os.path.join(self.discard_dir, str(len(os.listdir(self.discard_dir)))))
+				if backup is not None:
+					self._move(backup, path)
+			except OSError as e:
+				logger.error(f"Could not roll back {path}: {e}")
+				self.failed.append(path)
+		logger.info(f"Rolled back {len(entries) - len(self.failed)} of {len(entries)} paths")
+		return len(entries) - len(self.failed)
+
+	def keep(self, directory: str) -> bool:
+		"""Move the backups out of the work area holding them, into a new rollback folder in directory.
+
+		For after a rollback that left paths unrestored, when the work area is about to be removed.
+		Returns False if they could not be moved, in which case they go with the work area.
+		"""
+		try:
+			destination = os.path.join(tempfile.mkdtemp(prefix=ROLLBACK_PREFIX, dir=directory), "Journal")
+			os.rename(self.backup_dir, destination)
+		except OSError as e:
+			logger.error(f"Could not keep the backups in {self.backup_dir}: {e}")
+			return False
+		self.backup_dir = destination
+		self.discard_dir = os.path.join(destination, "discarded")
+		return True
+
+	def commit(self):
+		"""Keep the changes; the backups are removed along with the backup directory."""
+		with self._lock:
+			logger.debug(f"Committing install of {len(self._entries)} paths")
+			self._entries = []
+			self._recorded.clear()
@@ -2,16 +2,24 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
-import os
+import threading
 import wx
 
 from ASS import BasePanel
+from ASS.game_discovery import normalize
+
+# Typing pauses longer than this before the path is checked
+VALIDATE_DELAY_MS = 300
 
 class InstallationPathPanel(BasePanel):
 	def __init__(self, parent):
 		super(InstallationPathPanel, self).__init__(parent, "Choose Installation Path")
-		self._executable_name = None
+		self.discovery = parent.game_discovery
+		self.validator = self.discovery.validator
+		self._validate_call = None
 		self.setup_ui()
+		# Usually already done, as the welcome panel starts looking; filled in when it finishes if not
+		self.discovery.start().add_done_callback(lambda future: wx.CallAfter(self.on_discovered, future))
 
 	def setup_ui(self):
 		instruction_text = wx.StaticText(self, label="Please choose installation path:")
@@ -20,9 +28,6 @@ class InstallationPathPanel(BasePanel):
 		browse_button = wx.Button(self, label="&Browse")
 		browse_button.Bind(wx.EVT_BUTTON, self.on_browse)
 
-		# Check if we can prepopulate the path
-		self.path_text_ctrl.SetValue(self.default_install_path)
-
 		self.path_text_ctrl.Bind(wx.EVT_TEXT, self.on_path_text_change)  # Bind text change event
 
 		# Layout
@@ -36,48 +41,55 @@ class InstallationPathPanel(BasePanel):
 		# Nav buttons
 		self.prev_button = self.add_nav_button("&Previous", self.on_prev)
 		self.next_button = self.add_nav_button("&Next", self.on_next)
-		self.next_button.Enable(self.is_path_valid(self.path_text_ctrl.GetValue()))
+		self.next_button.Enable(False)
+
+	def on_discovered(self, future):
+		# The panel may have been left before the search finished
+		if not self: return
+		try:
+			paths = future.result()
+		except Exception:
+			# Already logged; the user can still type or browse to the folder
+			return
+		# Don't overwrite a path the user has started typing
+		if paths and not self.path_text_ctrl.GetValue().strip():
+			self.path_text_ctrl.SetValue(paths[0])
 
 	def on_browse(self, event):
 		# Create and show a directory chooser dialog
 		with wx.DirDialog(self, "Choose installation directory", style=wx.DD_DEFAULT_STYLE) as dir_dialog:
 			if dir_dialog.ShowModal() == wx.ID_OK:
+				# Checked like a typed path, so 'Next' only lights up for a folder holding the game
 				self.path_text_ctrl.SetValue(dir_dialog.GetPath())
-				self.next_button.Enable(True)  # Enable the 'Next' button when a path is selected
 
 	def on_path_text_change(self, event):
-		# Enable the 'Next' button only if the text control is not empty
 		path = self.path_text_ctrl.GetValue()
-		self.next_button.Enable(self.is_path_valid(path))
-
-	@property
-	def executable_name(self):
-		if self._executable_name is None:
-			suffix = '.exe' if self.GetParent().platform == 'windows' else ''
-			self._executable_name = f"Stardew Valley{suffix}"
-		return self._executable_name
-
-	@property
-	def default_install_path(self):
-		# Function to find and return a default installation path, if available
-		frame = self.GetParent()
-		try:
-			os_paths = frame.sdv_path_info[frame.platform]
-		except KeyError as e:
-			raise Exception("Could not load os-specific path data") from e
-		for path in os_paths:
-			if os.path.exists(path) and os.path.isdir(path) and os.path.isfile(os.path.join(path, self.executable_name)):
-				return path
-		else:
-			return ""
+		if self._validate_call is not None:
+			self._validate_call.Stop()
+		known = self.validator.cached(path)
+		if known is not None:
+			self.next_button.Enable(known)
+			return
+		# Wait for a pause in typing, then check off the UI thread in case the path is on a slow drive
+		self.next_button.Enable(False)
+		self._validate_call = wx.CallLater(VALIDATE_DELAY_MS, self.validate_in_background, path)
+
+	def validate_in_background(self, path):
+		if not self: return
+		threading.Thread(target=lambda: wx.CallAfter(self.on_path_validated, path, self.is_path_valid(path)), name='ASS-validate', daemon=True).start()
+
+	def on_path_validated(self, path, valid):
+		# Only the answer for what is in the box now matters
+		if self and self.path_text_ctrl.GetValue() == path:
+			self.next_button.Enable(valid)
 
 	def is_path_valid(self, path):
-		return os.path.isdir(path) and os.path.isfile(os.path.join(path, "Stardew Valley.exe"))
+		return self.validator.check(path)
 
 	def on_next(self, event):
 		from ASS import ComponentSelectionPanel
 		frame = self.GetParent()
-		frame.installation_path = self.path_text_ctrl.GetValue().strip()
+		frame.installation_path = normalize(self.path_text_ctrl.GetValue())
 		wx.CallAfter(frame.switch_panel, ComponentSelectionPanel)  # Switch to the Component selection panel
 
 	def on_prev(self, event):
@@ -2,32 +2,120 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import errno
+import filecmp
+import glob
 import json
 import logging
+import threading
 import os
+import psutil
+import queue
 import shutil
+import socket
 import sys
 import tempfile
 import time
 from typing import Dict, Any, Optional
-import wx
 import zipfile
 
-from ASS.events import avEVT_INSTALLATION_COMPLETE, avEVT_NOTIFY, InstallationCompleteEvent, NotifyEvent
-from ASS.exceptions import DownloadedFileNotFoundException
+from ASS.download_store import DownloadStore
+from ASS.exceptions import DownloadedFileNotFoundException, ModConflictException
+from ASS.incremental import InstallManifest, changed_members, file_members
+from ASS.install_journal import InstallJournal
+from ASS.nested_archive import DEFAULT_SPOOL_THRESHOLD, open_nested_zip
+from ASS.observer import InstallObserver, resolve_observer
+from ASS.platforms import current_platform
+from ASS.progress import EXTRACT, ProgressTracker
 
 logger = logging.getLogger(__name__)
 
+STAGING_PREFIX = ".ass-staging-"
+# Names the process using a staging area, so other installers leave it alone
+STAGING_OWNER_FILE = "owner.json"
+# Staging areas whose owner can't be checked, e.g. one on another machine sharing the game folder, are left this long
+STALE_STAGING_AGE = 24 * 60 * 60
+# Where SMAPI's installer zip keeps the real payload; {root} is the zip's top folder
+SMAPI_INNER_ARCHIVE = "{root}internal/{platform}/install.dat"
+
+def _work_area_owner():
+	# The start time tells a live owner apart from a new process that reused its PID
+	return {'host': socket.gethostname(), 'pid': os.getpid(), 'started': psutil.Process().create_time()}
+
+def claim_work_area(path):
+	"""Mark a staging area as this process's, so other installers don't remove it as stale."""
+	with open(os.path.join(path, STAGING_OWNER_FILE), 'w', encoding='utf-8') as f:
+		json.dump(_work_area_owner(), f)
+
 class Installer:
-	def __init__(self, download_info: Dict[str, Any], sdv_dir: str, panel: Optional[wx.Panel]=None):
-		if __name__ != '__main__' and panel is None: raise TypeError('Installer must have a panel unless running directly on the command line')
+	def __init__(self, download_info: Dict[str, Any], sdv_dir: str, panel=None, store: Optional[DownloadStore]=None, extract_workers: int=1, atomic_staging: bool=False, incremental: bool=False, remove_stale: bool=False, transactional: bool=False, spool_threshold: int=DEFAULT_SPOOL_THRESHOLD, observer: Optional[InstallObserver]=None, platform: Optional[str]=None):
 		self.panel = panel
+		self.observer = resolve_observer(observer, panel)
+		# Which of SMAPI's per-OS payloads to install; defaults to the machine we're running on
+		self.platform = platform
 		self.download_info = download_info
 		self.sdv_dir = sdv_dir
+		self.store = store
 		logger.debug(f"Initializing Installer with:\n{download_info}")
 		self.keep_running = True
-		self._temp_dir = tempfile.TemporaryDirectory()
+		self._temp_dir = self._create_work_area(atomic_staging)
+		# Names of downloaded components waiting to be installed in pipelined mode; None ends the queue
+		self._pending = queue.Queue()
+		# zlib releases the GIL, so extraction threads genuinely run in parallel
+		self.extract_workers = max(1, int(extract_workers))
+		self._staged = []
+		self._staged_lock = threading.Lock()
+		# Incremental installs only write archive members whose size or CRC32 differ from what's installed
+		self.incremental = incremental
+		self.remove_stale = remove_stale
+		self._installed_files = {}
+		# Transactional installs journal every path written in the game directory so they can be rolled back
+		self.transactional = transactional
+		self.journal = None
+		# A staging area in the game directory holding just the journal, when the work area is elsewhere
+		self._journal_area = None
+		# Archives wrapped inside a release asset are unpacked in memory up to this size
+		self.spool_threshold = spool_threshold
 		
+	def _create_work_area(self, atomic_staging):
+		if atomic_staging:
+			# On the game's own filesystem mods can be moved into place by rename instead of copied again
+			self._remove_stale_work_areas()
+			try:
+				work_area = tempfile.TemporaryDirectory(prefix=STAGING_PREFIX, dir=self.sdv_dir)
+				claim_work_area(work_area.name)
+				return work_area
+			except OSError as e:
+				logger.warning(f"Could not stage inside {self.sdv_dir}, falling back to the system temp dir: {e}")
+		return tempfile.TemporaryDirectory()
+
+	def _is_abandoned(self, path):
+		try:
+			with open(os.path.join(path, STAGING_OWNER_FILE), encoding='utf-8') as f:
+				owner = json.load(f)
+			if owner.get('host') == socket.gethostname():
+				try:
+					return psutil.Process(owner['pid']).create_time() != owner['started']
+				except psutil.NoSuchProcess:
+					return True
+		except (OSError, ValueError, KeyError, TypeError, psutil.Error):
+			# No owner yet, another machine's, or unreadable; only its age can tell
+			pass
+		try:
+			return time.time() - os.path.getmtime(path) > STALE_STAGING_AGE
+		except OSError:
+			return False
+
+	def _remove_stale_work_areas(self):
+		# Left behind if a previous run was killed before it could clean up. Areas another
+		# installer, or another target of this one, is still using have a live owner.
+		for stale in glob.glob(os.path.join(glob.escape(self.sdv_dir), f"{STAGING_PREFIX}*")):
+			if not self._is_abandoned(stale): continue
+			logger.debug(f"Removing stale staging area {stale}")
+			shutil.rmtree(stale, ignore_errors=True)
+
 	def __enter__(self):
 		self.temp_dir = self._temp_dir.__enter__()
 		return self
@@ -40,8 +128,7 @@ class Installer:
 	@property
 	def mod_temp_dir(self):
 		modtemp = os.path.join(self.temp_dir, "Mods")
-		if not os.path.exists(modtemp):
-			os.mkdir(modtemp)
+		os.makedirs(modtemp, exist_ok=True)
 		return modtemp
 
 	@property
@@ -52,6 +139,10 @@ class Installer:
 		else: return mods_dir
 
 	def _retrieve_and_validate_download_path(self, name):
+		digest = self.download_info.get(name, {}).get('download_digest')
+		if self.store is not None and digest is not None:
+			# Resolving through the store also marks the download as recently used
+			return str(self.store.path_for(digest))
 		try:
 			downloaded_file_path = self.download_info[name]['download_path']
 		except KeyError as e:
@@ -59,73 +150,368 @@ class Installer:
 		if not os.path.exists(downloaded_file_path): raise DownloadedFileNotFoundException(f'Could not find downloaded file for {name} at "{downloaded_file_path}"')
 		return downloaded_file_path
 
-	def _unpack_smapi_installer(self, smapi_installer_filename):
-		# Open SMAPI installer zip file
-		with open(smapi_installer_filename, 'rb') as installer_file:
+	@contextmanager
+	def _open_archive(self, name, archive_filename):
+		"""Open a component's archive, reaching into the archive it wraps if download_info names one."""
+		inner_archive = self.download_info.get(name, {}).get('inner_archive')
+		if inner_archive is None and name == 'SMAPI':
+			inner_archive = SMAPI_INNER_ARCHIVE
+		with open(archive_filename, 'rb') as archive_file:
 			# Create ZipFile instance from opened file
-			smapi_zip = zipfile.ZipFile(installer_file)
-			# Create the OS appropriate path for the internal install.dat file we need
-			install_dat_internal_path = f'{smapi_zip.namelist()[0]}internal/{self.panel.GetParent().platform}/install.dat'
-			# Extract just this file to our temporary directory and store it's extracted path
-			install_dat_extracted_path = smapi_zip.extract(install_dat_internal_path, path=self.temp_dir)
-		return install_dat_extracted_path
-
-	def _unpack_install_dat(self, install_dat_extracted_path):
-		# Open the temporarily stored install.dat
-		with open(install_dat_extracted_path, 'rb') as install_dat:
-			install_zip = zipfile.ZipFile(install_dat)
-			# Extract contents directly to SDV directory
-			install_zip.extractall(self.sdv_dir)
+			archive = zipfile.ZipFile(archive_file)
+			if inner_archive is None:
+				yield archive
+				return
+			# Create the OS appropriate path for the inner archive we need
+			member = inner_archive.format(root=archive.namelist()[0], platform=self.platform or current_platform())
+			with open_nested_zip(archive, member, self.spool_threshold) as inner:
+				yield inner
 
 	def install_smapi(self):
 		self.log("Installing SMAPI")
 		smapi_installer_filename = self._retrieve_and_validate_download_path("SMAPI")
-		# Extract OS appropriate smapi install.dat (actually a zip file) to temp dir
-		install_dat_extracted_path = self._unpack_smapi_installer(smapi_installer_filename)
-		# Unpack the extracted install.dat into the Stardew Valley directory
-		self._unpack_install_dat(install_dat_extracted_path)
+		# Read the OS appropriate install.dat (actually a zip file) straight out of the installer zip
+		with self._open_archive("SMAPI", smapi_installer_filename) as install_zip:
+			# Extract contents directly to SDV directory
+			self._extract(install_zip, self.sdv_dir, self.sdv_dir, journaled=True, name="SMAPI")
+			self._record_files("SMAPI", file_members(install_zip))
 		# Copy SDV's deps.json file for SMAPI
-		shutil.copyfile(os.path.join(self.sdv_dir, "Stardew Valley.deps.json"), os.path.join(self.sdv_dir, "StardewModdingAPI.deps.json"))
+		smapi_deps_path = os.path.join(self.sdv_dir, "StardewModdingAPI.deps.json")
+		self._prepare_write(smapi_deps_path)
+		shutil.copyfile(os.path.join(self.sdv_dir, "Stardew Valley.deps.json"), smapi_deps_path)
 		self.log(f"Installed SMAPI to {self.sdv_dir}")
 
-	def _unpack_mod(self, mod_install_filename):
+	def _prepare_write(self, path):
+		if self.journal is not None:
+			self.journal.record(path)
+		elif os.path.isfile(path) and os.stat(path).st_nlink > 1:
+			# Hard linked from a multi-target install; writing in place would change every copy
+			os.remove(path)
+
+	def _extract(self, archive, destination, installed_root, journaled=False, name=None):
+		if self.incremental:
+			members, unchanged = changed_members(archive, installed_root)
+			logger.debug(f"{unchanged} files already up to date, writing {len(members)} entries to {destination}")
+		else:
+			members = archive.infolist()
+		tracker = ProgressTracker(name or os.path.basename(destination), EXTRACT, sum(info.file_size for info in members), self.post_progress)
+		for info in members:
+			if journaled:
+				# Writing straight into the game directory, so every member goes through the journal first
+				target_path = os.path.join(destination, info.filename)
+				if not (info.is_dir() and os.path.isdir(target_path)):
+					self._prepare_write(target_path)
+			archive.extract(info, path=destination)
+			tracker.advance(info.file_size)
+		tracker.finish()
+
+	def _record_files(self, name, files):
+		with self._staged_lock:
+			self._installed_files[name] = files
+
+	def _unpack_mod(self, mod_install_filename, destination=None, name=None):
 		# Open mod file
-		with open(mod_install_filename, 'rb') as mod_file:
-			# Create ZipFile instance from opened file
-			mod_zip = zipfile.ZipFile(mod_file)
-			# Extract the file to our temporary Mods directory
-			mod_zip.extractall(path=self.mod_temp_dir)
+		with self._open_archive(name, mod_install_filename) as mod_zip:
+			# Extract the file to our temporary Mods directory, or the mod's own staging area.
+			# Unchanged files skipped by an incremental install are carried over when the folder is swapped in,
+			# and simply stay where they are when it is copied over the installed one instead.
+			self._extract(mod_zip, destination or self.mod_temp_dir, os.path.join(self.sdv_dir, "Mods"), name=name)
+			return file_members(mod_zip, "Mods/")
 
 	def install_mod(self, name, leave_in_temp=False):
 		mod_install_filename = self._retrieve_and_validate_download_path(name)
-		self._unpack_mod(mod_install_filename)
+		self._record_files(name, self._unpack_mod(mod_install_filename, name=name))
 		if not leave_in_temp:
-			shutil.copytree(self.mod_temp_dir, self.sdv_dir, dirs_exist_ok=True)
-			shutil.rmtree(self.mod_temp_dir)
+			self._move_into_mods(self.mod_temp_dir)
+			self._update_manifest()
 			self.log(f"Installed {name} to {self.sdv_mods_dir}.")
 
 	def log(self, message):
-		wx.CallAfter(wx.PostEvent, self.panel, NotifyEvent(avEVT_NOTIFY, message=message))
+		self.observer.log(message)
+
+	def post_progress(self, progress):
+		self.observer.progress(progress)
+
+	def _staging_dir(self, name):
+		staging_dir = os.path.join(self.temp_dir, "Staging", name)
+		os.makedirs(staging_dir, exist_ok=True)
+		return staging_dir
+
+	def _stage_mod(self, name):
+		downloaded_file_path = self._retrieve_and_validate_download_path(name)
+		message = f"Installing {name} from {downloaded_file_path}..."
+		logger.debug(message)
+		self.log(message)
+		# Each archive gets its own staging area so several can be unpacked at once
+		files = self._unpack_mod(downloaded_file_path, self._staging_dir(name), name)
+		with self._staged_lock:
+			self._staged.append(name)
+		self._record_files(name, files)
+
+	def _install_component(self, name):
+		if not self.keep_running: return
+		if name == 'SMAPI':
+			self.install_smapi()
+		else:
+			self._stage_mod(name)
+
+	def _unpack_component(self, name, destination):
+		if not self.keep_running: return
+		if name != 'SMAPI':
+			self._stage_mod(name)
+			return
+		with self._open_archive("SMAPI", self._retrieve_and_validate_download_path("SMAPI")) as install_zip:
+			self._extract(install_zip, destination, destination, name="SMAPI")
+			self._record_files("SMAPI", file_members(install_zip))
+
+	def unpack_all(self, destination):
+		"""Extract every component into destination, laid out as in a game directory, leaving sdv_dir alone.
+
+		Returns the files each component installs, relative to the game directory.
+		"""
+		with ThreadPoolExecutor(max_workers=self.extract_workers, thread_name_prefix='ASS-extract') as executor:
+			futures = [executor.submit(self._unpack_component, name, destination) for name in self.download_info.keys()]
+			for future in futures:
+				future.result()
+		self._merge_staged()
+		mods_dir = os.path.join(destination, "Mods")
+		os.makedirs(mods_dir, exist_ok=True)
+		for entry in os.listdir(self.mod_temp_dir):
+			if os.path.lexists(os.path.join(mods_dir, entry)):
+				raise ModConflictException(f"Mods/{entry} is shipped by SMAPI and by another component")
+			os.rename(os.path.join(self.mod_temp_dir, entry), os.path.join(mods_dir, entry))
+		with self._staged_lock:
+			return dict(self._installed_files)
+
+	def _merge_staged(self):
+		"""Move every staged mod into the temporary Mods directory, refusing files two archives disagree on."""
+		owners = {}
+		conflicts = []
+		# Merge in configuration order so conflict reports don't depend on which thread finished first
+		staged = [name for name in self.download_info.keys() if name in self._staged]
+		for name in staged:
+			staging_dir = self._staging_dir(name)
+			for root, dirs, files in os.walk(staging_dir):
+				relative_root = os.path.relpath(root, staging_dir)
+				target_root = os.path.normpath(os.path.join(self.mod_temp_dir, relative_root))
+				os.makedirs(target_root, exist_ok=True)
+				for filename in files:
+					relative_path = os.path.normpath(os.path.join(relative_root, filename))
+					source = os.path.join(root, filename)
+					target = os.path.join(target_root, filename)
+					if os.path.exists(target):
+						if not filecmp.cmp(source, target, shallow=False):
+							conflicts.append(f"{relative_path} ({owners.get(relative_path)} and {name})")
+						continue
+					os.replace(source, target)
+					owners[relative_path] = name
+		if conflicts:
+			message = "These files are shipped differently by more than one component:\n" + "\n".join(conflicts)
+			self.log(message)
+			raise ModConflictException(message)
+
+	def _run_components(self, names):
+		"""Install the named components with up to extract_workers archives being unpacked at once."""
+		with ThreadPoolExecutor(max_workers=self.extract_workers, thread_name_prefix='ASS-extract') as executor:
+			futures = [executor.submit(self._install_component, name) for name in names]
+			for future in futures:
+				# Surface the first failure, as the sequential loop used to
+				future.result()
+
+	def _begin_transaction(self):
+		if not self.transactional: return
+		journal_dir = os.path.join(self.temp_dir, "Journal")
+		if os.path.dirname(os.path.realpath(self.temp_dir)) != os.path.realpath(self.sdv_dir):
+			# Backups must stay on the game's filesystem, or every replaced mod is copied out and back again
+			self._journal_area = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=self.sdv_dir)
+			claim_work_area(self._journal_area)
+			journal_dir = os.path.join(self._journal_area, "Journal")
+		self.journal = InstallJournal(journal_dir)
+
+	def _transaction(self, install):
+		"""Run install, rolling the game directory back if it fails or is canceled."""
+		self._begin_transaction()
+		try:
+			completed = install()
+		except Exception as e:
+			logger.exception("Installation failed")
+			try:
+				undone = self._end_transaction(False)
+			except Exception:
+				logger.exception("Rolling back the installation failed")
+				undone = f"Could not undo the changes made to {self.sdv_dir}, see the log for details."
+			# Runs on a worker thread, so the front end only hears of this through the observer
+			self.observer.installation_failed(f"Installation failed: {e}" + (f"\n{undone}" if undone else ""))
+			raise
+		undone = self._end_transaction(completed)
+		if completed:
+			self.observer.installation_complete()
+		elif undone:
+			self.log(f"Installation did not finish. {undone}")
+
+	def _end_transaction(self, completed) -> str:
+		"""Commit or roll back the journal, returning what a rollback undid for telling the user."""
+		journal, self.journal = self.journal, None
+		journal_area, self._journal_area = self._journal_area, None
+		undone = ""
+		if journal is not None and completed:
+			journal.commit()
+		elif journal is not None and len(journal):
+			restored = journal.rollback()
+			undone = f"Undid changes to {restored} paths in {self.sdv_dir}."
+			# The journal's work area is removed below or on exit, so backups still needed move out of it first
+			if journal.failed and journal.keep(self.sdv_dir):
+				undone += f" Could not restore {len(journal.failed)} paths; their previous copies are kept in {journal.backup_dir}."
+			elif journal.failed:
+				undone += f" Could not restore {len(journal.failed)} paths, see the log for details."
+				# Leave the journal's own area for stale cleanup rather than removing the backups now
+				journal_area = None
+		if journal_area is not None:
+			shutil.rmtree(journal_area, ignore_errors=True)
+		return undone
 
 	def install_all(self):
-		# SMAPI must be installed first
+		self._transaction(self._install_all)
+
+	def _install_all(self):
+		# SMAPI must be installed first. With several extract workers mods are unpacked alongside it,
+		# but they only reach the game's Mods folder once SMAPI is in place.
 		logger.debug('Installing SMAPI')
-		self.install_smapi()
-		for name in self.download_info.keys():
-			# Skip SMAPI as we already installed it
-			if name == 'SMAPI': continue
-			if not self.keep_running: return
-			downloaded_file_path = self._retrieve_and_validate_download_path(name)
-			message = f"Installing {name} from {downloaded_file_path}..."
-			logger.debug(message)
+		self._run_components(['SMAPI'] + [name for name in self.download_info.keys() if name != 'SMAPI'])
+		if not self.keep_running: return False
+		self._finish_mods()
+		return True
+
+	def enqueue(self, name):
+		"""Hand a freshly downloaded component to install_pipelined; safe to call from any thread."""
+		self._pending.put(name)
+
+	def finish_queue(self):
+		"""Tell install_pipelined that no more downloads are coming."""
+		self._pending.put(None)
+
+	def install_pipelined(self):
+		"""Install components in the order their downloads finish instead of waiting for all of them.
+
+		Mods are only unpacked into staging areas as they arrive, so they can come before SMAPI;
+		nothing is copied into the game's Mods folder until SMAPI is in place.
+		"""
+		self._transaction(self._install_pipelined)
+
+	def _install_pipelined(self):
+		remaining = set(self.download_info.keys())
+		with ThreadPoolExecutor(max_workers=self.extract_workers, thread_name_prefix='ASS-extract') as executor:
+			futures = []
+			for name in iter(self._pending.get, None):
+				if not self.keep_running: break
+				logger.debug(f'Installing {name} as soon as it was downloaded')
+				futures.append(executor.submit(self._install_component, name))
+				remaining.discard(name)
+			for future in futures:
+				future.result()
+		if not self.keep_running: return False
+		if remaining:
+			message = f"Cannot finish installing, these components were not downloaded: {', '.join(sorted(remaining))}"
 			self.log(message)
-			self.install_mod(name, True)
-		logger.debug(f"Copying {self.mod_temp_dir} to {self.sdv_dir}")
-		shutil.copytree(self.mod_temp_dir, os.path.join(self.sdv_dir, "Mods"), dirs_exist_ok=True)
+			raise DownloadedFileNotFoundException(message)
+		self._finish_mods()
+		return True
+
+	def _carry_over_leftovers(self, installed_dir, staged_dir):
+		"""Link files only the installed copy has (user configs, saved data) into the staged copy.
+
+		Hard links leave the installed copy whole, so a rollback can put it back exactly as it was.
+		"""
+		for root, dirs, files in os.walk(installed_dir):
+			relative_root = os.path.relpath(root, installed_dir)
+			for filename in files:
+				staged_path = os.path.normpath(os.path.join(staged_dir, relative_root, filename))
+				if not os.path.lexists(staged_path):
+					os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+					try:
+						os.link(os.path.join(root, filename), staged_path)
+					except OSError:
+						shutil.copy2(os.path.join(root, filename), staged_path)
+
+	def _swap_into_place(self, staged_path, target_path):
+		swapping_folder = os.path.isdir(staged_path) and os.path.isdir(target_path)
+		if swapping_folder:
+			self._carry_over_leftovers(target_path, staged_path)
+		if self.journal is not None:
+			# Moves the old copy into the journal's backups
+			self.journal.record(target_path)
+		elif swapping_folder:
+			# Park the old folder inside the work area; it goes away with the temporary directory
+			replaced_dir = tempfile.mkdtemp(dir=self.temp_dir, prefix="Replaced-")
+			os.rename(target_path, os.path.join(replaced_dir, os.path.basename(target_path)))
+		os.replace(staged_path, target_path)
+
+	def _copy_into_place(self, staged_path, target_path):
+		"""Copy a staged mod over the installed one file by file, for a work area on another filesystem.
+
+		Only what was staged is written; files an incremental install left out, and files only the
+		installed copy has, stay where they are.
+		"""
+		if not os.path.isdir(staged_path):
+			self._prepare_write(target_path)
+			shutil.move(staged_path, target_path)
+			return
+		for root, dirs, files in os.walk(staged_path):
+			target_root = os.path.normpath(os.path.join(target_path, os.path.relpath(root, staged_path)))
+			if not os.path.isdir(target_root):
+				self._prepare_write(target_root)
+				os.makedirs(target_root)
+			for filename in files:
+				target_file = os.path.join(target_root, filename)
+				self._prepare_write(target_file)
+				shutil.copy2(os.path.join(root, filename), target_file)
+		shutil.rmtree(staged_path)
+
+	def _move_into_mods(self, source_dir):
+		"""Swap each mod folder in source_dir into the game's Mods folder so it is never seen half-written."""
+		mods_dir = os.path.join(self.sdv_dir, "Mods")
+		os.makedirs(mods_dir, exist_ok=True)
+		# Swapping needs a rename; from another filesystem a copy is unavoidable, so copy no more than was staged
+		same_filesystem = os.stat(source_dir).st_dev == os.stat(mods_dir).st_dev
+		for entry in os.listdir(source_dir):
+			staged_path = os.path.join(source_dir, entry)
+			target_path = os.path.join(mods_dir, entry)
+			if not same_filesystem:
+				logger.debug(f"Copying {staged_path} to {mods_dir} as it is on another filesystem")
+				self._copy_into_place(staged_path, target_path)
+				continue
+			try:
+				self._swap_into_place(staged_path, target_path)
+			except OSError as e:
+				# e.g. two mount points of one filesystem, which rename refuses to cross
+				if e.errno != errno.EXDEV: raise
+				logger.debug(f"Copying {staged_path} to {mods_dir} as it could not be renamed there")
+				self._copy_into_place(staged_path, target_path)
+
+	def _update_manifest(self):
+		manifest = InstallManifest(self.sdv_dir)
+		with self._staged_lock:
+			installed_files = dict(self._installed_files)
+		for name, files in installed_files.items():
+			if self.remove_stale:
+				# Through the journal, removing a file just moves it among the backups
+				removed = manifest.remove_stale(name, files, remove=os.remove if self.journal is None else self.journal.record)
+				if removed:
+					self.log(f"Removed {len(removed)} files the new {name} no longer ships")
+			manifest.update(name, files)
+		self._prepare_write(manifest.path)
+		manifest.save()
+
+	def _finish_mods(self):
+		self._merge_staged()
+		logger.debug(f"Moving {self.mod_temp_dir} into {self.sdv_dir}")
+		self._move_into_mods(self.mod_temp_dir)
+		self._update_manifest()
 		time.sleep(1)
 		self.log(f"Installed mods to {self.sdv_mods_dir}.")
-		wx.CallAfter(wx.PostEvent, self.panel, InstallationCompleteEvent(avEVT_INSTALLATION_COMPLETE))
 
 	def stop(self):
 		self.keep_running = False
+		# Wake install_pipelined if it is waiting on a download that will never come
+		self._pending.put(None)
 
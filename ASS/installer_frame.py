@@ -3,12 +3,17 @@
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 import json
+import logging
 import os
 import sys
+import threading
+import time
 import wx
 
 from ASS import ConfirmationDialog, WelcomePanel
-from ASS.exceptions import UnsupportedOSError
+from ASS.platforms import current_platform
+
+logger = logging.getLogger(__name__)
 
 INSTALLER_FILENAME = "data/installer.json"
 
@@ -30,7 +35,11 @@ class InstallerFrame(wx.Frame):
 			installer_config = json.load(f)
 			self.download_info = installer_config['download_info']
 			self.sdv_path_info = installer_config['sdv_path_info']
+			self.settings = installer_config.get('settings', {})
 		self.installation_path = None
+		self._http_session = None
+		self._http_session_lock = threading.Lock()
+		self._game_discovery = None
 		self.setup_ui()
 		self.SetSize(800, 600)
 		self.Center()
@@ -58,9 +67,11 @@ class InstallerFrame(wx.Frame):
 
 	def switch_panel(self, new_panel_class, *args):
 		"""Switches the current panel to a new one specified by new_panel_class."""
+		started = time.perf_counter()
 		if self.panel:  # Remove the current panel if it exists
 			self.panel.Destroy()
 		self.panel = new_panel_class(self, *args)  # Create an instance of the new panel
+		logger.debug(f"Built {new_panel_class.__name__} in {(time.perf_counter() - started) * 1000:.0f} ms")
 		self.sizer.Add(self.panel, 1, wx.EXPAND)
 		self.Layout()  # Re-layout to accommodate the new panel
 		self.Fit()  # Fit the frame snugly around the contents
@@ -87,14 +98,33 @@ class InstallerFrame(wx.Frame):
 	@property
 	def platform(self):
 		# Acts as a string property returning the appropriate OS name for the SMAPI zip
-		if sys.platform == 'win32':
-			return 'windows'
-		elif sys.platform == linux:
-			return 'linux'
-		elif sys.platform == 'darwin':
-			return 'macOS'
-		else:
-			raise UnsupportedOSError('Smapi is not supported on {sys.platform}')
+		return current_platform()
+
+	@property
+	def http_session(self):
+		# Shared by every Downloader so connections opened early are reused
+		with self._http_session_lock:
+			if self._http_session is None:
+				from ASS.http_session import HTTPSession
+				self._http_session = HTTPSession(pool_size=self.settings.get('download_workers', 1) + 1)
+		return self._http_session
+
+	@property
+	def game_discovery(self):
+		# Kept on the frame so going back to the path panel doesn't search again
+		if self._game_discovery is None:
+			from ASS.game_discovery import GameDiscovery
+			self._game_discovery = GameDiscovery(self.platform, self.sdv_path_info.get(self.platform, []), cache_path=os.path.join(self.app_dir, "game_locations.json"))
+		return self._game_discovery
+
+	def start_game_discovery(self):
+		self.game_discovery.start()
+
+	def prewarm_connections(self):
+		"""Open connections to GitHub in the background while the user works through the first panels."""
+		from ASS.headless import release_resolver
+		api = release_resolver(self.settings) == 'graphql' and bool(self.token)
+		threading.Thread(target=lambda: self.http_session.prewarm(self.settings.get('download_workers', 1), api=api), name='ASS-prewarm', daemon=True).start()
 
 	@property
 	def is_steam_install(self):
@@ -0,0 +1,32 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import wx
+
+class LogHistoryDialog(wx.Dialog):
+	"""Shows every message logged so far, including lines the panel's text box no longer holds."""
+	def __init__(self, parent, text):
+		super(LogHistoryDialog, self).__init__(parent, wx.ID_ANY, "Full Log", size=(500, 400))
+		vbox = wx.BoxSizer(wx.VERTICAL)
+
+		self.log_text = wx.TextCtrl(self, value=text, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.HSCROLL)
+		vbox.Add(self.log_text, proportion=1, flag=wx.EXPAND | wx.ALL, border=10)
+
+		copy_btn = wx.Button(self, label="&Copy log to clipboard")
+		copy_btn.Bind(wx.EVT_BUTTON, self.on_copy_to_clipboard)
+		close_btn = wx.Button(self, wx.ID_CANCEL, label="C&lose")
+
+		hbox = wx.BoxSizer(wx.HORIZONTAL)
+		hbox.Add(copy_btn)
+		hbox.Add(close_btn, flag=wx.LEFT, border=10)
+		vbox.Add(hbox, flag=wx.ALIGN_CENTER | wx.TOP | wx.BOTTOM, border=10)
+
+		self.SetSizer(vbox)
+		self.log_text.SetFocus()
+
+	def on_copy_to_clipboard(self, event):
+		if wx.TheClipboard.Open():
+			wx.TheClipboard.SetData(wx.TextDataObject(self.log_text.GetValue()))
+			wx.TheClipboard.Close()
+			wx.MessageBox("Log copied to clipboard.", "Copied", wx.OK | wx.ICON_INFORMATION)
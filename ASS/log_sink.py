@@ -0,0 +1,45 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from collections import deque
+import threading
+from typing import List, Tuple
+
+MAX_VISIBLE_LINES = 500
+
+class LogSink:
+	"""Collects log lines from any thread and hands them to the GUI in batches.
+
+	write() only appends to a list under a lock, so it is cheap enough to call per file.
+	The GUI calls drain() on a timer and gets everything written since the last call,
+	while a bounded ring holds what the visible text box should show. Every line is
+	also kept in the history so the whole log can still be shown or copied on request.
+	"""
+	def __init__(self, max_visible: int=MAX_VISIBLE_LINES):
+		self.visible = deque(maxlen=max_visible)
+		self.history: List[str] = []
+		self._pending: List[str] = []
+		self._lock = threading.Lock()
+
+	def write(self, message: str):
+		with self._lock:
+			self._pending.append(message)
+
+	def drain(self) -> Tuple[List[str], List[str]]:
+		"""Return the lines to show since the last drain, and the oldest visible lines they push out."""
+		with self._lock:
+			lines, self._pending = self._pending, []
+		if not lines: return lines, []
+		self.history.extend(lines)
+		# A burst bigger than the box would only scroll its own start straight back out
+		shown = lines[-self.visible.maxlen:]
+		overflow = len(self.visible) + len(shown) - self.visible.maxlen
+		dropped = [self.visible.popleft() for _ in range(max(0, overflow))]
+		self.visible.extend(shown)
+		return shown, dropped
+
+	def history_text(self) -> str:
+		with self._lock:
+			pending = list(self._pending)
+		return "".join(f"{line}\n" for line in self.history + pending)
@@ -0,0 +1,84 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+DEFAULT_TTL = 15 * 60
+
+class MetadataCache:
+	"""Persistent store of compact GitHub API records keyed by request URL.
+
+	Entries younger than ttl seconds are used without touching the network. Older ones keep
+	their ETag / Last-Modified validators so they can be revalidated with a conditional request.
+	put() and touch() only change memory; callers save() once they are done resolving.
+	"""
+	def __init__(self, path: Optional[str]=None, ttl: float=DEFAULT_TTL):
+		self.path = path
+		self.ttl = ttl
+		self._lock = threading.Lock()
+		self._entries: Dict[str, Dict[str, Any]] = {}
+		self._dirty = False
+		self.load()
+
+	def load(self):
+		if self.path is None or not os.path.exists(self.path): return
+		try:
+			with open(self.path, encoding='utf-8') as f:
+				contents = json.load(f)
+		except (OSError, ValueError) as e:
+			logger.warning(f"Ignoring unreadable metadata cache {self.path}: {e}")
+			return
+		if contents.get('version') != CACHE_VERSION:
+			logger.debug(f"Discarding metadata cache with version {contents.get('version')}")
+			return
+		self._entries = contents.get('entries', {})
+		logger.debug(f"Loaded {len(self._entries)} cached metadata entries from {self.path}")
+
+	def save(self):
+		"""Write the cache out if anything changed since it was last saved."""
+		if self.path is None: return
+		with self._lock:
+			if not self._dirty: return
+			# Write next to the real file and swap it in so a crash never leaves half a cache behind.
+			# The name is unique so another installer sharing the app dir can't write over it meanwhile.
+			temp_path = None
+			try:
+				handle, temp_path = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix=".tmp", dir=os.path.dirname(os.path.abspath(self.path)))
+				with os.fdopen(handle, 'w', encoding='utf-8') as f:
+					json.dump({'version': CACHE_VERSION, 'entries': self._entries}, f, separators=(',', ':'))
+				os.replace(temp_path, self.path)
+				self._dirty = False
+			except OSError as e:
+				logger.warning(f"Could not save metadata cache to {self.path}: {e}")
+				if temp_path is not None and os.path.exists(temp_path):
+					os.remove(temp_path)
+
+	def get(self, key: str) -> Optional[Dict[str, Any]]:
+		with self._lock:
+			return self._entries.get(key)
+
+	def is_fresh(self, entry: Dict[str, Any]) -> bool:
+		return self.ttl > 0 and time.time() - entry.get('fetched_at', 0) < self.ttl
+
+	def put(self, key: str, data: Any, etag: Optional[str]=None, last_modified: Optional[str]=None):
+		with self._lock:
+			self._entries[key] = {'data': data, 'etag': etag, 'last_modified': last_modified, 'fetched_at': time.time()}
+			self._dirty = True
+
+	def touch(self, key: str):
+		"""Mark an entry as freshly validated after the server answered 304 Not Modified."""
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None: return
+			entry['fetched_at'] = time.time()
+			self._dirty = True
@@ -0,0 +1,169 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import filecmp
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional
+
+from ASS.headless import fetch, installer_options, validate_game_dir
+from ASS.incremental import InstallManifest
+from ASS.install_journal import InstallJournal
+from ASS.installer import STAGING_PREFIX, Installer, claim_work_area
+from ASS.observer import InstallObserver
+
+logger = logging.getLogger(__name__)
+
+# Mods rewrite their config files in place, which would reach every target through a hard link
+COPY_SUFFIXES = ('.json',)
+
+@dataclass
+class TargetResult:
+	path: str
+	linked: int = 0
+	copied: int = 0
+	unchanged: int = 0
+	error: Optional[Exception] = None
+	# Where previous copies of files a rollback could not restore were kept
+	kept_backups: Optional[str] = None
+
+	@property
+	def ok(self) -> bool:
+		return self.error is None
+
+	def summary(self) -> str:
+		if not self.ok:
+			kept = f"; files that could not be restored have their previous copies in {self.kept_backups}" if self.kept_backups else ""
+			return f"{self.path}: failed, {self.error}{kept}"
+		return f"{self.path}: {self.linked} files linked, {self.copied} copied, {self.unchanged} already up to date"
+
+def _is_current(source, target):
+	try:
+		return os.path.samefile(source, target) or filecmp.cmp(source, target, shallow=False)
+	except OSError:
+		return False
+
+class TargetFiller:
+	"""Fills one game directory from an extracted tree, linking files where the filesystem allows it."""
+	def __init__(self, tree: str, target: str, installed_files: Dict[str, List[str]], incremental: bool=False, remove_stale: bool=False, transactional: bool=True):
+		self.tree = tree
+		self.result = TargetResult(target)
+		self.target = target
+		self.installed_files = installed_files
+		self.incremental = incremental
+		self.remove_stale = remove_stale
+		self.transactional = transactional
+		self.journal = None
+		# Hard links only work within one filesystem; copying is the fallback for everything else
+		self.link = os.stat(tree).st_dev == os.stat(target).st_dev
+
+	def _prepare_write(self, path):
+		if self.journal is not None:
+			self.journal.record(path)
+		elif os.path.isfile(path) or os.path.islink(path):
+			# Replace rather than overwrite, so files hard linked into other targets stay as they are
+			os.remove(path)
+
+	def _place(self, source, target_path):
+		if self.incremental and _is_current(source, target_path):
+			self.result.unchanged += 1
+			return
+		self._prepare_write(target_path)
+		if self.link and not target_path.lower().endswith(COPY_SUFFIXES):
+			try:
+				os.link(source, target_path)
+				self.result.linked += 1
+				return
+			except OSError as e:
+				# e.g. FAT32 or exFAT drives, which have no hard links
+				logger.debug(f"Could not link into {self.target}, copying instead: {e}")
+				self.link = False
+		shutil.copy2(source, target_path)
+		self.result.copied += 1
+
+	def _fill(self):
+		for root, dirs, files in os.walk(self.tree):
+			target_root = os.path.normpath(os.path.join(self.target, os.path.relpath(root, self.tree)))
+			if not os.path.isdir(target_root):
+				self._prepare_write(target_root)
+				os.makedirs(target_root)
+			for filename in files:
+				self._place(os.path.join(root, filename), os.path.join(target_root, filename))
+		# Copy SDV's deps.json file for SMAPI; each copy of the game has its own
+		smapi_deps_path = os.path.join(self.target, "StardewModdingAPI.deps.json")
+		self._prepare_write(smapi_deps_path)
+		shutil.copyfile(os.path.join(self.target, "Stardew Valley.deps.json"), smapi_deps_path)
+		manifest = InstallManifest(self.target)
+		for name, files in self.installed_files.items():
+			if self.remove_stale:
+				manifest.remove_stale(name, files, remove=os.remove if self.journal is None else self.journal.record)
+			manifest.update(name, files)
+		self._prepare_write(manifest.path)
+		manifest.save()
+
+	def fill(self) -> TargetResult:
+		"""Install into the target, undoing its changes if anything goes wrong, and report what was done."""
+		with tempfile.TemporaryDirectory(prefix=STAGING_PREFIX, dir=self.target) as work_dir:
+			claim_work_area(work_dir)
+			if self.transactional:
+				self.journal = InstallJournal(os.path.join(work_dir, "Journal"))
+			try:
+				self._fill()
+			except Exception as e:
+				logger.exception(f"Install into {self.target} failed")
+				self.result.error = e
+				if self.journal is not None:
+					self.journal.rollback()
+					# work_dir is removed on leaving this block, so backups still needed move out of it
+					if self.journal.failed and self.journal.keep(self.target):
+						self.result.kept_backups = self.journal.backup_dir
+			else:
+				if self.journal is not None:
+					self.journal.commit()
+			finally:
+				self.journal = None
+		return self.result
+
+def provision(download_info: Dict[str, Any], settings: Dict[str, Any], targets: Iterable[str], app_dir: str, observer: InstallObserver, token: Optional[str]=None, platform: Optional[str]=None, bundle: Optional[str]=None) -> List[TargetResult]:
+	"""Install the same components into several game directories.
+
+	Releases are resolved and downloaded once and each archive is extracted once, into a tree
+	on the first target's filesystem. Every target is then filled from that tree, so the work
+	grows with the number of archives plus the number of targets rather than their product.
+	"""
+	results = {}
+	valid_targets = []
+	# Also drops the same directory given twice under different names
+	targets = list(dict.fromkeys(os.path.realpath(os.path.expanduser(t)) for t in targets))
+	for target in targets:
+		try:
+			validate_game_dir(target)
+			valid_targets.append(target)
+		except OSError as e:
+			results[target] = TargetResult(target, error=e)
+			observer.log(results[target].summary())
+	if valid_targets:
+		store = fetch(download_info, settings, app_dir, observer, token=token, bundle=bundle)
+		options = installer_options(settings)
+		# The shared tree is extracted in full; each target decides for itself what is already current
+		installer = Installer(download_info, valid_targets[0], store=store, observer=observer, platform=platform,
+			extract_workers=options['extract_workers'], spool_threshold=options['spool_threshold'],
+			atomic_staging=True, incremental=False, transactional=False)
+		with installer:
+			tree = os.path.join(installer.temp_dir, "Tree")
+			os.makedirs(tree)
+			installed_files = installer.unpack_all(tree)
+			fillers = [TargetFiller(tree, target, installed_files, incremental=options['incremental'], remove_stale=options['remove_stale'], transactional=options['transactional']) for target in valid_targets]
+			with ThreadPoolExecutor(max_workers=min(len(fillers), options['extract_workers']), thread_name_prefix='ASS-target') as executor:
+				for result in executor.map(TargetFiller.fill, fillers):
+					results[result.path] = result
+					observer.log(result.summary())
+	ordered = [results[target] for target in targets]
+	if ordered and all(result.ok for result in ordered):
+		observer.installation_complete()
+	return ordered
@@ -0,0 +1,34 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from contextlib import contextmanager
+import logging
+import shutil
+import tempfile
+from typing import Iterator
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_THRESHOLD = 64 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+@contextmanager
+def open_nested_zip(outer: zipfile.ZipFile, member: str, spool_threshold: int=DEFAULT_SPOOL_THRESHOLD) -> Iterator[zipfile.ZipFile]:
+	"""Open a zip stored inside another zip without extracting it to a file first.
+
+	ZipFile needs a seekable file, so the member is inflated once into a SpooledTemporaryFile,
+	which stays in memory unless the inner archive is bigger than spool_threshold bytes.
+	"""
+	info = outer.getinfo(member)
+	with tempfile.SpooledTemporaryFile(max_size=spool_threshold) as buffer:
+		if info.file_size > spool_threshold:
+			# Don't fill memory only to copy it all out to disk halfway through
+			buffer.rollover()
+		with outer.open(info) as stream:
+			shutil.copyfileobj(stream, buffer, COPY_CHUNK_SIZE)
+		buffer.seek(0)
+		logger.debug(f"Opened nested archive {member} ({info.file_size} bytes) {'on disk' if info.file_size > spool_threshold else 'in memory'}")
+		with zipfile.ZipFile(buffer) as inner:
+			yield inner
@@ -0,0 +1,65 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import logging
+import sys
+
+from ASS.progress import ProgressUpdate, describe
+
+logger = logging.getLogger(__name__)
+
+class InstallObserver:
+	"""Receives messages and milestones from Downloader and Installer.
+
+	Methods are called from worker threads. This base class only writes messages to the log,
+	so subclasses override whatever their front end needs.
+	"""
+	def log(self, message: str):
+		logger.info(message)
+
+	def progress(self, update: ProgressUpdate):
+		pass
+
+	def downloads_complete(self):
+		pass
+
+	def installation_complete(self):
+		pass
+
+	def installation_failed(self, message: str):
+		"""Called once when downloading or installing stops on an error; the game directory has been rolled back if it could be."""
+		logger.error(message)
+
+class ConsoleObserver(InstallObserver):
+	"""Prints messages, and finished progress lines, for headless installs."""
+	def __init__(self, stream=None, verbose: bool=False):
+		self.stream = stream if stream is not None else sys.stdout
+		self.verbose = verbose
+		self.completed = False
+
+	def _print(self, message):
+		super(ConsoleObserver, self).log(message)
+		# The frozen Windows build has no console, so there may be nowhere to print to
+		if self.stream is not None:
+			print(message, file=self.stream, flush=True)
+
+	def log(self, message):
+		self._print(message)
+
+	def progress(self, update):
+		if update.finished or self.verbose:
+			self._print(describe(update))
+
+	def installation_complete(self):
+		self.completed = True
+
+def resolve_observer(observer, panel=None) -> InstallObserver:
+	"""Pick the observer for an engine object, wrapping a wx panel when that is all it was given."""
+	if observer is not None:
+		return observer
+	if panel is not None:
+		# Only GUI callers pass a panel, so only they pay for importing wx
+		from ASS.wx_observer import WxObserver
+		return WxObserver(panel)
+	return InstallObserver()
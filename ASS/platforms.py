@@ -0,0 +1,18 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import sys
+
+from ASS.exceptions import UnsupportedOSError
+
+def current_platform() -> str:
+	"""The OS name SMAPI's installer and data/installer.json use for this machine."""
+	if sys.platform == 'win32':
+		return 'windows'
+	elif sys.platform.startswith('linux'):
+		return 'linux'
+	elif sys.platform == 'darwin':
+		return 'macOS'
+	else:
+		raise UnsupportedOSError(f'Smapi is not supported on {sys.platform}')
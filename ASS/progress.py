@@ -0,0 +1,119 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import time
+from typing import Callable, NamedTuple, Optional
+
+MAX_UPDATES_PER_SECOND = 4
+# Weight given to the newest rate sample; lower is smoother but slower to react
+RATE_SMOOTHING = 0.3
+
+DOWNLOAD = "download"
+EXTRACT = "extract"
+
+class ProgressUpdate(NamedTuple):
+	component: str
+	phase: str
+	bytes_done: int
+	bytes_total: Optional[int]
+	rate: float
+	eta: Optional[float]
+
+	@property
+	def finished(self) -> bool:
+		return self.bytes_total is not None and self.bytes_done >= self.bytes_total
+
+	@property
+	def fraction(self) -> Optional[float]:
+		if not self.bytes_total: return None
+		return min(1.0, self.bytes_done / self.bytes_total)
+
+class ProgressTracker:
+	"""Tracks bytes for one component and phase, reporting at most max_rate updates per second.
+
+	Intermediate updates are coalesced rather than queued, so a fast transfer costs the GUI
+	a handful of events no matter how small its chunks are. The final update always goes out.
+	"""
+	def __init__(self, component: str, phase: str, total: Optional[int], report: Callable[[ProgressUpdate], None], done: int=0, max_rate: float=MAX_UPDATES_PER_SECOND):
+		self.component = component
+		self.phase = phase
+		self.total = total or None
+		self.report = report
+		self.done = done
+		self.interval = 1 / max_rate
+		self.rate = 0.0
+		self._sample_time = self._started = time.monotonic()
+		self._sample_done = done
+		self._last_report = 0.0
+
+	def _measure(self, now):
+		elapsed = now - self._sample_time
+		if elapsed <= 0: return
+		sample = (self.done - self._sample_done) / elapsed
+		self.rate = sample if self.rate == 0 else RATE_SMOOTHING * sample + (1 - RATE_SMOOTHING) * self.rate
+		self._sample_time = now
+		self._sample_done = self.done
+
+	def snapshot(self) -> ProgressUpdate:
+		eta = None
+		if self.total is not None and self.rate > 0:
+			eta = max(0.0, (self.total - self.done) / self.rate)
+		return ProgressUpdate(self.component, self.phase, self.done, self.total, self.rate, eta)
+
+	def restart(self, done: int):
+		"""Start counting again from done, e.g. when a retried transfer resumes at a different offset."""
+		self.done = self._sample_done = done
+		self._sample_time = time.monotonic()
+
+	def advance(self, count: int):
+		self.done += count
+		# The last chunk is left for finish(), which reports the average rate
+		if self.total is not None and self.done >= self.total: return
+		now = time.monotonic()
+		if now - self._last_report < self.interval: return
+		self._measure(now)
+		self._last_report = now
+		self.report(self.snapshot())
+
+	def finish(self):
+		now = time.monotonic()
+		self._measure(now)
+		# Report the average over the whole phase rather than the last sample
+		elapsed = now - self._started
+		if elapsed > 0 and self.done:
+			self.rate = self.done / elapsed
+		if self.total is None:
+			self.total = self.done
+		self.done = max(self.done, self.total)
+		self.report(self.snapshot())
+
+def format_size(size: float) -> str:
+	for unit in ("bytes", "KB", "MB"):
+		if size < 1024:
+			return f"{size:.0f} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+		size /= 1024
+	return f"{size:.1f} GB"
+
+def format_duration(seconds: float) -> str:
+	seconds = int(round(seconds))
+	if seconds < 60:
+		return f"{seconds} second{'s' if seconds != 1 else ''}"
+	minutes, seconds = divmod(seconds, 60)
+	return f"{minutes} minute{'s' if minutes != 1 else ''} {seconds} seconds"
+
+def describe(update: ProgressUpdate) -> str:
+	"""One sentence suitable for reading out with a screen reader."""
+	verb = "Downloading" if update.phase == DOWNLOAD else "Unpacking"
+	if update.finished:
+		verb = "Downloaded" if update.phase == DOWNLOAD else "Unpacked"
+		return f"{verb} {update.component}, {format_size(update.bytes_done)} at {format_size(update.rate)} per second."
+	parts = [f"{verb} {update.component}:"]
+	if update.fraction is not None:
+		parts.append(f"{update.fraction:.0%}, {format_size(update.bytes_done)} of {format_size(update.bytes_total)},")
+	else:
+		parts.append(f"{format_size(update.bytes_done)},")
+	parts.append(f"{format_size(update.rate)} per second")
+	if update.eta is not None:
+		parts.append(f"- about {format_duration(update.eta)} left")
+	return " ".join(parts) + "."
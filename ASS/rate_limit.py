@@ -0,0 +1,164 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import logging
+import random
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth trying again; 403 and 429 only when GitHub says it is a rate limit
+TRANSIENT_STATUSES = (500, 502, 503, 504)
+RATE_LIMIT_STATUSES = (403, 429)
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+# Below this fraction of the hourly budget, calls are spaced out to last until the reset
+PACE_BELOW = 0.25
+# Tell the user once the budget gets this low
+WARN_BELOW = 10
+# GitHub's window is an hour; anything longer is a bad header
+MAX_WAIT = 3600
+# Added to waits for the reset, as clocks on the LAN and at GitHub rarely agree to the second
+CLOCK_SLACK = 2.0
+
+class RateLimitStatus(NamedTuple):
+	limit: int
+	remaining: int
+	# Unix time at which remaining goes back up to limit
+	reset: float
+
+	def describe(self) -> str:
+		return f"{self.remaining} of {self.limit} GitHub API requests left until {time.strftime('%H:%M', time.localtime(self.reset))}"
+
+def backoff_delay(attempt: int) -> float:
+	"""Full jitter exponential backoff, so machines that failed together don't retry together."""
+	return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def format_wait(seconds: float) -> str:
+	if seconds < 90:
+		return f"{max(1, round(seconds))} seconds"
+	return f"{round(seconds / 60)} minutes"
+
+class RateLimitScheduler:
+	"""Sends GitHub API requests within the rate limit budget instead of running into it.
+
+	Every response's X-RateLimit-* headers update the budget. When it runs low, calls are
+	spaced out across the time left until the reset; when it is gone, or GitHub answers with
+	a rate limit error or Retry-After, the caller waits rather than fails. Connection errors
+	and 5xx responses are retried with jittered exponential backoff.
+	"""
+	def __init__(self, report: Optional[Callable[[str], None]]=None, max_attempts: int=MAX_ATTEMPTS):
+		self.report = report
+		self.max_attempts = max(1, max_attempts)
+		self.status: Optional[RateLimitStatus] = None
+		self._lock = threading.Lock()
+		self._next_slot = 0.0
+		self._warned = False
+		# Set to give up on waits early, e.g. when the user cancels
+		self.canceled = threading.Event()
+
+	def _report(self, message: str):
+		logger.info(message)
+		if self.report is not None:
+			self.report(message)
+
+	def update(self, response: requests.Response):
+		headers = response.headers
+		try:
+			status = RateLimitStatus(int(headers['X-RateLimit-Limit']), int(headers['X-RateLimit-Remaining']), float(headers['X-RateLimit-Reset']))
+		except (KeyError, ValueError):
+			return
+		with self._lock:
+			self.status = status
+			warn = status.remaining <= WARN_BELOW and not self._warned
+			self._warned = self._warned or warn
+		if warn:
+			self._report(f"Running low on GitHub API requests: {status.describe()}")
+
+	def _wait(self, seconds: float) -> bool:
+		"""Sleep, returning False if canceled first."""
+		return not self.canceled.wait(max(0.0, min(seconds, MAX_WAIT)))
+
+	def _pace(self) -> bool:
+		"""Hold this call back if the budget has to be spread out; False if canceled while waiting."""
+		with self._lock:
+			status = self.status
+			now = time.time()
+			if status is None or status.reset <= now:
+				return True
+			if status.remaining <= 0:
+				delay = status.reset - now + CLOCK_SLACK
+			elif status.remaining < status.limit * PACE_BELOW:
+				# Reserve a slot an even share of the time left after the previous one
+				slot = max(now, self._next_slot)
+				self._next_slot = slot + (status.reset - now) / status.remaining
+				delay = slot - now
+			else:
+				return True
+		if status.remaining <= 0:
+			self._report(f"GitHub API requests used up, waiting until {time.strftime('%H:%M', time.localtime(status.reset))} to continue")
+		elif delay > 1:
+			logger.debug(f"Spacing out GitHub API calls, waiting {delay:.1f}s: {status.describe()}")
+		return self._wait(delay)
+
+	def _retry_delay(self, response: requests.Response) -> Optional[float]:
+		"""How long to wait before retrying this response, or None if it shouldn't be retried."""
+		retry_after = response.headers.get('Retry-After')
+		if response.status_code in RATE_LIMIT_STATUSES:
+			if retry_after is not None:
+				try:
+					return float(retry_after)
+				except ValueError:
+					return BACKOFF_CAP
+			if response.headers.get('X-RateLimit-Remaining') == '0':
+				try:
+					return float(response.headers['X-RateLimit-Reset']) - time.time() + CLOCK_SLACK
+				except (KeyError, ValueError):
+					return BACKOFF_CAP
+			# A plain 403, e.g. a bad token: waiting won't help
+			return None
+		if response.status_code in TRANSIENT_STATUSES:
+			return float(retry_after) if retry_after and retry_after.isdigit() else -1
+		return None
+
+	def send(self, request: Callable[[], requests.Response]) -> requests.Response:
+		"""Make the request once the budget allows, retrying what is worth retrying.
+
+		Rate limit waits don't use up attempts, so a fleet that exhausts the hourly budget
+		waits for the reset rather than failing. Returns the last response, which the caller
+		checks as usual, or raises the last connection error.
+		"""
+		attempt = 0
+		while True:
+			if not self._pace():
+				raise requests.ConnectionError("Canceled while waiting for the GitHub API rate limit")
+			try:
+				response = request()
+			except TRANSIENT_ERRORS as e:
+				attempt += 1
+				if attempt >= self.max_attempts: raise
+				delay = backoff_delay(attempt)
+				logger.debug(f"GitHub API request failed, retrying in {delay:.1f}s: {e}")
+				if not self._wait(delay): raise
+				continue
+			self.update(response)
+			delay = self._retry_delay(response)
+			if delay is None:
+				return response
+			if response.status_code in RATE_LIMIT_STATUSES:
+				# A reset already in the past, by our clock, would otherwise retry in a tight loop
+				delay = max(delay, BACKOFF_BASE)
+				self._report(f"GitHub API rate limit reached, waiting {format_wait(delay)} before trying again")
+			else:
+				attempt += 1
+				if attempt >= self.max_attempts: return response
+				# -1 means no Retry-After was given
+				delay = backoff_delay(attempt) if delay < 0 else delay
+				logger.debug(f"GitHub API answered {response.status_code}, retrying in {delay:.1f}s")
+			if not self._wait(delay): return response
@@ -0,0 +1,74 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import logging
+import re
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+class ReleaseIndex:
+	"""Lazily pages through the releases of one repository on behalf of every component using it.
+
+	Releases are only fetched until the lookup being served has found its match, and each
+	release fetched is checked against all registered lookups so components sharing a
+	repository (e.g. Kokoro and ProjectFluent) are usually satisfied by a single pass.
+	"""
+	def __init__(self, repository: str, releases: Iterable[Any]):
+		self.repository = repository
+		self._releases = iter(releases)
+		self._seen = []
+		self._exhausted = False
+		self._patterns = {}
+		self._pending = set()
+		self._found = {}
+
+	@staticmethod
+	def _key(title_filter: Optional[str], include_prerelease: bool):
+		return (title_filter or None, bool(include_prerelease))
+
+	def _pattern(self, title_filter: Optional[str]):
+		if title_filter not in self._patterns:
+			self._patterns[title_filter] = re.compile(title_filter) if title_filter else None
+		return self._patterns[title_filter]
+
+	def _matches(self, release, key) -> bool:
+		title_filter, include_prerelease = key
+		if release.prerelease and not include_prerelease: return False
+		pattern = self._pattern(title_filter)
+		return pattern is None or pattern.match(release.title or '') is not None
+
+	def register(self, title_filter: Optional[str]=None, include_prerelease: bool=False):
+		"""Declare a lookup up front so releases paged for other lookups are checked against it too."""
+		key = self._key(title_filter, include_prerelease)
+		if key in self._found or key in self._pending: return key
+		for release in self._seen:
+			if self._matches(release, key):
+				self._found[key] = release
+				return key
+		if not self._exhausted:
+			self._pending.add(key)
+		return key
+
+	def find(self, title_filter: Optional[str]=None, include_prerelease: bool=False):
+		"""Return the newest release matching the filter, or None if the repository has none."""
+		key = self.register(title_filter, include_prerelease)
+		while key not in self._found and not self._exhausted:
+			self._advance()
+		return self._found.get(key)
+
+	def _advance(self):
+		try:
+			release = next(self._releases)
+		except StopIteration:
+			logger.debug(f"Reached the end of {len(self._seen)} releases for {self.repository}")
+			self._exhausted = True
+			self._pending.clear()
+			return
+		self._seen.append(release)
+		for key in [key for key in self._pending if self._matches(release, key)]:
+			self._pending.discard(key)
+			self._found[key] = release
+		if not self._pending:
+			logger.debug(f"All lookups for {self.repository} satisfied after {len(self._seen)} releases")
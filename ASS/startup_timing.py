@@ -0,0 +1,44 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from contextlib import contextmanager
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+class StartupTimer:
+	"""Records how long launching takes, from when this module is first imported.
+
+	Each step is logged as it happens and finish() logs one summary line starting with
+	"Startup:", so time-to-first-panel can be compared between releases by searching ASS.log.
+	"""
+	def __init__(self):
+		self.started = time.perf_counter()
+		self.steps = []
+		self.finished = False
+
+	def elapsed_ms(self) -> float:
+		return (time.perf_counter() - self.started) * 1000
+
+	@contextmanager
+	def measure(self, label: str):
+		started = time.perf_counter()
+		try:
+			yield
+		finally:
+			duration = (time.perf_counter() - started) * 1000
+			self.steps.append((label, duration))
+			logger.debug(f"{label} took {duration:.0f} ms")
+
+	def finish(self, label: str="first panel shown"):
+		if self.finished: return
+		self.finished = True
+		steps = ", ".join(f"{step} {duration:.0f} ms" for step, duration in self.steps)
+		frozen = " (frozen build)" if getattr(sys, 'frozen', False) else ""
+		logger.info(f"Startup: {label} after {self.elapsed_ms():.0f} ms{frozen}; {steps}")
+
+# Created on first import, which main.py does before anything else
+startup = StartupTimer()
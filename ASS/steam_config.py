@@ -0,0 +1,92 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import shutil
+from typing import Dict, Iterable, Optional, Tuple
+
+from ASS import vdf
+from ASS.exceptions import VDFError
+
+logger = logging.getLogger(__name__)
+
+APPS_PATH = ("UserLocalConfigStore", "Software", "Valve", "Steam", "apps")
+PERSONA_PATH = ("UserLocalConfigStore", "friends", "PersonaName")
+LAUNCH_OPTIONS_KEY = "LaunchOptions"
+MAX_ACCOUNT_WORKERS = 8
+
+def _key(path: Iterable[str]) -> Tuple[str, ...]:
+	return tuple(part.lower() for part in path)
+
+def read_config(path: str) -> str:
+	with open(path, 'rb') as f:
+		# surrogateescape carries bytes that aren't valid UTF-8 through unchanged
+		return f.read().decode('utf-8', errors='surrogateescape')
+
+def write_config(path: str, text: str):
+	"""Replace the file in one step, so Steam never sees it half written."""
+	temp_path = f"{path}.tmp"
+	with open(temp_path, 'wb') as f:
+		f.write(text.encode('utf-8', errors='surrogateescape'))
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(temp_path, path)
+
+def scan_account(config_path: str, appid: str) -> Optional[str]:
+	"""The account's persona name if it has the game in its apps, else None."""
+	text = read_config(config_path)
+	found = vdf.find(text, [PERSONA_PATH, APPS_PATH + (appid,)])
+	if _key(APPS_PATH + (appid,)) not in found:
+		return None
+	persona = found.get(_key(PERSONA_PATH))
+	# Accounts that never set a name still need their launch options
+	return persona.value.value if persona is not None else os.path.basename(os.path.dirname(os.path.dirname(config_path)))
+
+def find_accounts(userdata_path: str, appid: str) -> Dict[str, str]:
+	"""localconfig.vdf paths of the accounts on this machine that own the game, keyed by persona name."""
+	config_paths = []
+	for account_id in os.listdir(userdata_path):
+		config_path = os.path.join(userdata_path, account_id, "config", "localconfig.vdf")
+		if os.path.isfile(config_path):
+			config_paths.append(config_path)
+		else:
+			logger.debug(f"No Steam config for account {account_id}")
+	def attempt(config_path):
+		try:
+			return scan_account(config_path, appid)
+		except (OSError, VDFError) as e:
+			# One damaged config shouldn't hide every other account
+			logger.warning(f"Could not read Steam config {config_path}: {e}")
+			return None
+	if not config_paths: return {}
+	with ThreadPoolExecutor(max_workers=min(MAX_ACCOUNT_WORKERS, len(config_paths)), thread_name_prefix='ASS-steam') as executor:
+		names = list(executor.map(attempt, config_paths))
+	return {name: path for name, path in zip(names, config_paths) if name is not None}
+
+def set_launch_options(config_path: str, appid: str, launch_options: str):
+	"""Set the game's launch options for one account, keeping the old file as .bak."""
+	text = read_config(config_path)
+	block = vdf.find(text, [APPS_PATH + (appid,)]).get(_key(APPS_PATH + (appid,)))
+	if block is None or not block.is_block:
+		raise VDFError(f"{config_path} has no settings for app {appid}")
+	patched = vdf.set_value(text, block, LAUNCH_OPTIONS_KEY, launch_options)
+	if patched == text: return
+	shutil.copy2(config_path, f"{config_path}.bak")
+	write_config(config_path, patched)
+
+def set_launch_options_for(config_paths: Iterable[str], appid: str, launch_options: str) -> Dict[str, Optional[Exception]]:
+	"""Set launch options for several accounts at once, returning each one's error or None."""
+	config_paths = list(config_paths)
+	def attempt(config_path):
+		try:
+			set_launch_options(config_path, appid, launch_options)
+		except Exception as e:
+			logger.exception(f"Failed adding launch options to {config_path}")
+			return e
+		return None
+	if not config_paths: return {}
+	with ThreadPoolExecutor(max_workers=min(MAX_ACCOUNT_WORKERS, len(config_paths)), thread_name_prefix='ASS-steam') as executor:
+		return dict(zip(config_paths, executor.map(attempt, config_paths)))
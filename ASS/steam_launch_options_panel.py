@@ -5,13 +5,11 @@
 import logging
 import os
 import psutil 
-from requests.structures import CaseInsensitiveDict
-import shutil
 import time
-import vdf
 import wx
 
 from ASS.base_panel import BasePanel
+from ASS.steam_config import find_accounts, set_launch_options_for
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +27,7 @@ class SteamLaunchOptionsPanel(BasePanel):
 	def appid(self):
 		try:
 			with open(os.path.join(self.sdv_path, 'steam_appid.txt')) as f:
-				appid = f.read()
+				appid = f.read().strip()
 		except Exception as e:
 			appid = None
 		return appid or "413150"
@@ -45,21 +43,16 @@ class SteamLaunchOptionsPanel(BasePanel):
 
 	@property
 	def localconfigs(self):
-		configs = {}
+		"""localconfig.vdf paths of the accounts that own the game, keyed by persona name."""
 		if self._configs is None:
+			self._configs = {}
 			try:
-				for accountid  in os.listdir(self.steam_userdata_path):
-					config_path = os.path.join(self.steam_userdata_path, accountid, "config", "localconfig.vdf")
-					if not os.path.exists(config_path): raise FileNotFoundError(f"Could not load Steam config from {config_path}")
-					with open(config_path, encoding='utf-8') as f:
-						lconfig = vdf.load(f, mapper=CaseInsensitiveDict)
-					name = lconfig["UserLocalConfigStore"]["friends"]["PersonaName"]
-					if self.appid not in lconfig["UserLocalConfigStore"]["Software"]["Valve"]["Steam"]["apps"]: continue
-					configs[name] = {"path": config_path, "data": lconfig}
-				self._configs = configs
+				userdata_path = self.steam_userdata_path
+				if userdata_path is not None:
+					self._configs = find_accounts(userdata_path, self.appid)
 			except Exception as e:
-				msg = f"Failed to modify steam launch options due to: {e}; accounts: {[accountid for accountid  in os.listdir(self.steam_userdata_path)]}"
-				logger.debug(msg)
+				msg = f"Failed to modify steam launch options due to: {e}"
+				logger.exception(msg)
 				self.GetParent().dump_log(msg)
 		return self._configs
 
@@ -170,24 +163,11 @@ class SteamLaunchOptionsPanel(BasePanel):
 
 	def add_steam_launch_options(self):
 		"Add launch options to Steam."
-		for name, info in self.localconfigs.items():
-			try:
-				path = info["path"]
-				lconfig = info['data']
-				lconfig["UserLocalConfigStore"]["Software"]["Valve"]["Steam"]["apps"][self.appid]['LaunchOptions'] = self.launch_options
-			except Exception as E:
-				msg = f"Failed adding launch options to config due to {e}"
-				logger.exception(msg)
-				self.GetParent().dump_log(msg)
-			try:
-				shutil.copy2(path, path+".bak")
-			except Exception as e:
-				msg = f"Failed to back up {path} due to {e}"
-				logger.exception(msg)
-				self.GetParent().dump_log(msg)
-
-			with open(path, 'w', encoding='utf-8', newline='') as f:
-				vdf.dump(lconfig, f, pretty=True)
+		# Only the LaunchOptions value changes in each file; everything else stays byte for byte
+		results = set_launch_options_for(self.localconfigs.values(), self.appid, self.launch_options)
+		for name, path in self.localconfigs.items():
+			if results.get(path) is not None:
+				self.GetParent().dump_log(f"Failed adding launch options for {name} to {path} due to {results[path]}")
 
 	def on_cancel(self, event):
 		"Overridden to do nothing or to show a message that canceling is not an option anymore."
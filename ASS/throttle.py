@@ -0,0 +1,124 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Longest a transfer sleeps at once, so cancellation is noticed promptly even at very low rates
+MAX_WAIT = 0.25
+# How often the concurrency controller looks at throughput and decides whether to change course
+SAMPLE_INTERVAL = 2.0
+# Throughput must beat the previous window by this fraction for more transfers to count as helping
+IMPROVEMENT = 0.10
+# Time to first byte this many times the best seen means the link or server is struggling
+LATENCY_BACKOFF = 3.0
+
+class TokenBucket:
+	"""Caps the combined rate of every transfer that draws from it.
+
+	rate is in bytes per second, 0 for no limit. burst is how many bytes may go out at once
+	after a quiet spell; it defaults to a quarter of a second's worth.
+	"""
+	def __init__(self, rate: float=0, burst: Optional[float]=None):
+		self._lock = threading.Lock()
+		self.set_rate(rate, burst)
+
+	def set_rate(self, rate: float, burst: Optional[float]=None):
+		with self._lock:
+			self.rate = max(0.0, float(rate))
+			self.burst = float(burst) if burst else max(self.rate / 4, 64 * 1024)
+			self._tokens = self.burst
+			self._updated = time.monotonic()
+
+	@property
+	def limited(self) -> bool:
+		return self.rate > 0
+
+	def consume(self, amount: int, keep_running: Callable[[], bool]=lambda: True) -> bool:
+		"""Block until amount bytes may be sent, returning False if keep_running turned false first."""
+		if not self.limited: return True
+		while True:
+			with self._lock:
+				now = time.monotonic()
+				self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+				self._updated = now
+				# Go into debt rather than refuse chunks larger than the burst; the next caller pays it off
+				if self._tokens > 0:
+					self._tokens -= amount
+					return True
+				wait = -self._tokens / self.rate + 0.001
+			if not keep_running(): return False
+			time.sleep(min(wait, MAX_WAIT))
+
+class ConcurrencyController:
+	"""Decides how many transfers run at once from the throughput and latency they achieve.
+
+	Starts low and adds a transfer whenever the previous addition raised combined throughput;
+	drops one when throughput falls or time to first byte balloons, which is what a saturated
+	uplink or a struggling server looks like from here. Workers call acquire before each
+	transfer, release after, and report bytes and latencies as they go.
+	"""
+	def __init__(self, maximum: int, minimum: int=1, initial: Optional[int]=None):
+		self.maximum = max(1, maximum)
+		self.minimum = max(1, min(minimum, self.maximum))
+		self.limit = max(self.minimum, min(initial if initial is not None else 2, self.maximum))
+		self.active = 0
+		self._condition = threading.Condition()
+		self._window_started = time.monotonic()
+		self._window_bytes = 0
+		self._window_latency = 0.0
+		self._previous_throughput = 0.0
+		self._best_latency = None
+
+	def acquire(self, keep_running: Callable[[], bool]=lambda: True) -> bool:
+		with self._condition:
+			while self.active >= self.limit:
+				if not keep_running(): return False
+				self._condition.wait(MAX_WAIT)
+			self.active += 1
+			return True
+
+	def release(self):
+		with self._condition:
+			self.active -= 1
+			self._condition.notify()
+
+	def record_latency(self, seconds: float):
+		with self._condition:
+			if self._best_latency is None or seconds < self._best_latency:
+				self._best_latency = seconds
+			self._window_latency = max(self._window_latency, seconds)
+
+	def record_bytes(self, amount: int):
+		with self._condition:
+			self._window_bytes += amount
+			elapsed = time.monotonic() - self._window_started
+			if elapsed >= SAMPLE_INTERVAL:
+				self._adjust(self._window_bytes / elapsed)
+
+	def _adjust(self, throughput: float):
+		# Called with the condition held
+		slow = self._best_latency is not None and self._window_latency > self._best_latency * LATENCY_BACKOFF
+		# With free slots, less throughput means the queue is draining, not that the link is congested
+		busy = self.active >= self.limit
+		if slow or (busy and throughput < self._previous_throughput * (1 - IMPROVEMENT)):
+			step = -1
+		elif busy and throughput > self._previous_throughput * (1 + IMPROVEMENT):
+			# Only worth another slot if the ones we have are all busy
+			step = 1
+		else:
+			step = 0
+		limit = max(self.minimum, min(self.maximum, self.limit + step))
+		if limit != self.limit:
+			logger.debug(f"{throughput / 1e6:.2f} MB/s with {self.limit} transfers, now allowing {limit}")
+			self.limit = limit
+			self._condition.notify_all()
+		self._previous_throughput = throughput
+		self._window_started = time.monotonic()
+		self._window_bytes = 0
+		self._window_latency = 0.0
@@ -0,0 +1,175 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Reading Valve's KeyValues text format, which Steam uses for libraryfolders.vdf and friends.
+
+Besides parsing whole files, find() locates a few keys without building anything for the
+rest, and set_value() changes one value in place, leaving every other byte of the file as
+Steam wrote it. Both matter for localconfig.vdf, which grows to megabytes on old accounts.
+"""
+
+import re
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from ASS.exceptions import VDFError
+
+# One quoted string, brace or bare word, after any whitespace, comments and conditionals such as [$WIN32]
+TOKEN = re.compile(r'(?:\s+|//[^\n]*|\[[^\]\n]*\])*(?:"((?:[^"\\]|\\.)*)"|([{}])|([^\s"{}\[]+))?', re.DOTALL)
+# Everything up to the next brace that isn't inside a string or comment, for stepping over blocks
+# Each alternative consumes something different, and none can repeat inside another, so a missing brace fails in linear time
+BLOCK_SKIP = re.compile(r'(?:[^{}"/]|"(?:[^"\\]|\\.)*"|//[^\n]*|/)*([{}])', re.DOTALL)
+UNESCAPES = {'n': '\n', 't': '\t', '\\': '\\', '"': '"'}
+ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+
+class Token(NamedTuple):
+	# 'string' or 'brace'
+	kind: str
+	value: str
+	# Offsets into the text, so callers can splice changes into the original
+	start: int
+	end: int
+
+def unescape(value: str) -> str:
+	return ESCAPE.sub(lambda m: UNESCAPES.get(m.group(1), '\\' + m.group(1)), value)
+
+def escape(value: str) -> str:
+	return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\t', '\\t')
+
+def tokens(text: str, start: int=0, end: Optional[int]=None) -> Iterator[Token]:
+	"""Tokens between the start and end offsets, with offsets into the whole text."""
+	position = start
+	end = len(text) if end is None else end
+	while position < end:
+		match = TOKEN.match(text, position, end)
+		quoted, brace, bare = match.groups()
+		if quoted is not None:
+			yield Token('string', unescape(quoted), match.start(1) - 1, match.end())
+		elif brace is not None:
+			yield Token('brace', brace, match.start(2), match.end())
+		elif bare is not None:
+			yield Token('string', bare, match.start(3), match.end())
+		elif match.end() < end:
+			raise VDFError(f"Unexpected character at offset {match.end()}")
+		else:
+			return
+		position = match.end()
+
+def _skip_block(text: str, position: int, end: int) -> int:
+	"""The offset just after the brace closing the block whose contents start at position."""
+	depth = 1
+	while True:
+		match = BLOCK_SKIP.match(text, position, end)
+		if match is None:
+			raise VDFError("Unexpected end of file")
+		depth += 1 if match.group(1) == '{' else -1
+		position = match.end()
+		if depth == 0:
+			return position
+
+class Match(NamedTuple):
+	key: Token
+	# The value for a string, or the opening brace for a block
+	value: Token
+	# The closing brace of a block, None for a string
+	end: Optional[Token]
+
+	@property
+	def is_block(self) -> bool:
+		return self.end is not None
+
+def _lower_paths(paths: Iterable[Iterable[str]]) -> Tuple[Tuple[str, ...], ...]:
+	return tuple(tuple(part.lower() for part in path) for path in paths)
+
+def find(text: str, paths: Iterable[Iterable[str]], start: int=0, end: Optional[int]=None) -> Dict[Tuple[str, ...], Match]:
+	"""Locate the values at the given key paths, matched case-insensitively as Steam does.
+
+	Returns the first match for each path found, keyed by the lowercased path. Blocks no
+	path leads into are stepped over without being tokenized, and scanning stops as soon
+	as every path has been found.
+	"""
+	wanted = set(_lower_paths(paths))
+	prefixes = {path[:i] for path in wanted for i in range(len(path))}
+	found = {}
+	# For each open block: the path of its parent, its key and its opening brace
+	stack = []
+	path = ()
+	key = None
+	end = len(text) if end is None else end
+	stream = tokens(text, start, end)
+	while len(found) < len(wanted):
+		token = next(stream, None)
+		if token is None:
+			break
+		if token.kind == 'brace' and token.value == '{':
+			if key is None:
+				raise VDFError(f"Block without a name at offset {token.start}")
+			block_path = path + (key.value.lower(),)
+			if block_path in wanted or block_path in prefixes:
+				stack.append((path, key, token))
+				path = block_path
+			else:
+				# Jump over it without tokenizing; this is most of a large localconfig.vdf
+				stream = tokens(text, _skip_block(text, token.end, end), end)
+			key = None
+		elif token.kind == 'brace':
+			if not stack or key is not None:
+				# Closing the block find() was started inside of, or a stray brace
+				break
+			parent, block_key, opening = stack.pop()
+			if path in wanted and path not in found:
+				found[path] = Match(block_key, opening, token)
+			path = parent
+		elif key is None:
+			key = token
+		else:
+			value_path = path + (key.value.lower(),)
+			if value_path in wanted and value_path not in found:
+				found[value_path] = Match(key, token, None)
+			key = None
+	return found
+
+def set_value(text: str, block: Match, key: str, value: str) -> str:
+	"""Return text with key set to value directly inside block, adding the key if it isn't there.
+
+	Only the value itself is replaced, or one line is inserted before the block's closing brace
+	in Steam's own layout, so the rest of the file is untouched.
+	"""
+	existing = find(text, [(key,)], start=block.value.end, end=block.end.start).get((key.lower(),))
+	quoted = f'"{escape(value)}"'
+	if existing is not None and not existing.is_block:
+		return text[:existing.value.start] + quoted + text[existing.value.end:]
+	if existing is not None:
+		raise VDFError(f"{key} is a block, not a value")
+	line_start = text.rfind('\n', 0, block.end.start) + 1
+	indent = text[line_start:block.end.start]
+	if indent.strip():
+		# The closing brace shares a line with other tokens; keep it simple rather than pretty
+		return text[:block.end.start] + f'"{escape(key)}" {quoted} ' + text[block.end.start:]
+	newline = '\r\n' if text[line_start - 2:line_start] == '\r\n' else '\n'
+	return text[:line_start] + f'{indent}\t"{escape(key)}"\t\t{quoted}{newline}' + text[line_start:]
+
+def parse(text: str) -> Dict[str, Any]:
+	"""Parse KeyValues text into nested dicts; later duplicate keys win, as they do in Steam."""
+	root = {}
+	stack = [root]
+	key = None
+	for token in tokens(text):
+		if token.kind == 'brace' and token.value == '{':
+			if key is None:
+				raise VDFError(f"Block without a name at offset {token.start}")
+			block = stack[-1][key] = {}
+			stack.append(block)
+			key = None
+		elif token.kind == 'brace':
+			if len(stack) == 1 or key is not None:
+				raise VDFError(f"Unexpected }} at offset {token.start}")
+			stack.pop()
+		elif key is None:
+			key = token.value
+		else:
+			stack[-1][key] = token.value
+			key = None
+	if len(stack) != 1 or key is not None:
+		raise VDFError("Unexpected end of file")
+	return root
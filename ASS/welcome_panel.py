@@ -4,7 +4,6 @@
 
 import wx
 from ASS.base_panel import BasePanel
-from ASS.installation_path_panel import InstallationPathPanel
 
 DESCRIPTION = """Welcome to Accessible Stardew Setup!
 
@@ -19,6 +18,10 @@ class WelcomePanel(BasePanel):
 		# Setup specific content
 		self.setup_ui()
 
+		# Get connections to GitHub ready and look for the game while the user reads, but only once the panel is on screen
+		wx.CallAfter(self.GetParent().prewarm_connections)
+		wx.CallAfter(self.GetParent().start_game_discovery)
+
 	def setup_ui(self):
 		welcome_text = wx.StaticText(self, label="Welcome to Accessible Stardew Setup!")
 		# Use a TextCtrl for the description to improve accessibility
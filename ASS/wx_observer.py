@@ -0,0 +1,31 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import wx
+
+from ASS.events import *
+from ASS.observer import InstallObserver
+
+class WxObserver(InstallObserver):
+	"""Forwards engine callbacks to a panel as wx events, posted on the GUI thread."""
+	def __init__(self, panel: wx.Panel):
+		self.panel = panel
+
+	def _post(self, event):
+		wx.CallAfter(wx.PostEvent, self.panel, event)
+
+	def log(self, message):
+		self._post(NotifyEvent(avEVT_NOTIFY, message=message))
+
+	def progress(self, update):
+		self._post(ProgressEvent(avEVT_PROGRESS, progress=update))
+
+	def downloads_complete(self):
+		self._post(DownloadsCompleteEvent(avEVT_DOWNLOADS_COMPLETE))
+
+	def installation_complete(self):
+		self._post(InstallationCompleteEvent(avEVT_INSTALLATION_COMPLETE))
+
+	def installation_failed(self, message):
+		self._post(InstallationFailedEvent(avEVT_INSTALLATION_FAILED, message=message))
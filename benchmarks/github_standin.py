@@ -0,0 +1,330 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""A local stand-in for the parts of GitHub the Downloader talks to.
+
+Serves /repos/{owner}/{repo}, paginated /repos/{owner}/{repo}/releases with ETags and Link
+headers, the batched repository and release query the GraphQL resolver sends to /graphql, and
+release assets behind a github.com style redirect to a "CDN" path that honours
+Range requests. Latency, bandwidth, pagination depth, payload sizes and an API rate limit are configurable,
+and every request is counted so benchmarks can report how many API calls a change costs.
+"""
+
+from dataclasses import dataclass, field
+import hashlib
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Characters stripped from a release_title_filter to turn it into a title it matches
+REGEX_SYNTAX = re.compile(r'[\^$\\.*+?()\[\]{}|]')
+WRITE_CHUNK_SIZE = 64 * 1024
+MAX_PER_PAGE = 100
+
+@dataclass
+class StandinConfig:
+	# Added before every response, API and download alike
+	latency: float = 0.0
+	# Bytes per second for each asset transfer; 0 means as fast as the machine allows
+	bandwidth: int = 0
+	# Unrelated releases published after each component's latest one, which makes lookups page deeper
+	filler_releases: int = 0
+	payload_size: int = 1024 * 1024
+	# Send browser_download_url through a 302 like github.com does
+	redirect_downloads: bool = True
+	# Publish sha256 digests with each asset, as GitHub does for newer releases
+	publish_digests: bool = True
+	# API requests allowed per rate_window, answered with 403 once used up like GitHub does; 0 for no limit
+	rate_limit: int = 0
+	rate_window: float = 3600.0
+
+@dataclass
+class Counters:
+	api_requests: int = 0
+	not_modified: int = 0
+	rate_limited: int = 0
+	redirects: int = 0
+	downloads: int = 0
+	bytes_sent: int = 0
+	by_path: Dict[str, int] = field(default_factory=dict)
+
+def title_for(title_filter: Optional[str], version: str) -> str:
+	if not title_filter:
+		return f"Release {version}"
+	title = f"{REGEX_SYNTAX.sub('', title_filter)} {version}"
+	if not re.match(title_filter, title):
+		raise ValueError(f"Cannot make up a release title matching {title_filter!r}")
+	return title
+
+class GitHubStandin:
+	"""Builds fake repositories for a download_info dict and serves them on localhost."""
+	def __init__(self, download_info: Dict[str, Any], config: Optional[StandinConfig]=None, host: str='127.0.0.1', port: int=0):
+		self.config = config if config is not None else StandinConfig()
+		self.counters = Counters()
+		self._lock = threading.Lock()
+		self.server = ThreadingHTTPServer((host, port), self._handler_class())
+		self.server.daemon_threads = True
+		self.base_url = f"http://{host}:{self.server.server_address[1]}"
+		self.repositories = {}
+		self.payloads = {}
+		self._build(download_info)
+		self._thread = None
+		self._window_reset = time.time() + self.config.rate_window
+		self._window_used = 0
+
+	def _build(self, download_info):
+		next_id = 1
+		for name, info in download_info.items():
+			if not isinstance(info, dict): continue
+			repository = info['repository']
+			releases = self.repositories.setdefault(repository, [])
+			# Oldest first here; served newest first
+			for filler in range(self.config.filler_releases):
+				releases.append(self._release(next_id, f"Unrelated Mod 0.{filler}", None))
+				next_id += 1
+			component = name.replace('&', '')
+			payload = os.urandom(self.config.payload_size)
+			self.payloads[next_id] = payload
+			asset_name = f"{component}-1.0.0.zip"
+			releases.append(self._release(next_id, title_for(info.get('release_title_filter'), "1.0.0"), (asset_name, payload)))
+			next_id += 1
+		for releases in self.repositories.values():
+			releases.reverse()
+
+	def _release(self, release_id, title, asset):
+		release = {'id': release_id, 'name': title, 'tag_name': title.replace(' ', '-'), 'prerelease': False, 'assets': []}
+		if asset is not None:
+			asset_name, payload = asset
+			release['assets'].append({
+				'id': release_id,
+				'name': asset_name,
+				'size': len(payload),
+				'updated_at': '2024-01-01T00:00:00Z',
+				'digest': f"sha256:{hashlib.sha256(payload).hexdigest()}" if self.config.publish_digests else None,
+				'browser_download_url': None
+			})
+		return release
+
+	def asset_url(self, asset_id: int) -> str:
+		return f"{self.base_url}/download/{asset_id}"
+
+	def total_payload_bytes(self) -> int:
+		return sum(len(payload) for payload in self.payloads.values())
+
+	def start(self):
+		self._thread = threading.Thread(target=self.server.serve_forever, name='github-standin', daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.stop()
+
+	def reset_counters(self):
+		with self._lock:
+			self.counters = Counters()
+
+	def count(self, kind: str, path: str, amount: int=1):
+		with self._lock:
+			setattr(self.counters, kind, getattr(self.counters, kind) + amount)
+			if kind != 'bytes_sent':
+				self.counters.by_path[path] = self.counters.by_path.get(path, 0) + 1
+
+	def take_api_call(self) -> Tuple[Dict[str, str], bool]:
+		"""Charge one API request to the budget, returning GitHub's rate limit headers and whether it was over."""
+		if not self.config.rate_limit: return {}, False
+		with self._lock:
+			now = time.time()
+			if now >= self._window_reset:
+				self._window_reset = now + self.config.rate_window
+				self._window_used = 0
+			exceeded = self._window_used >= self.config.rate_limit
+			if not exceeded:
+				self._window_used += 1
+			headers = {
+				'X-RateLimit-Limit': str(self.config.rate_limit),
+				'X-RateLimit-Remaining': str(self.config.rate_limit - self._window_used),
+				'X-RateLimit-Reset': str(int(self._window_reset)),
+				'X-RateLimit-Used': str(self._window_used)
+			}
+			return headers, exceeded
+
+	def releases_page(self, repository: str, page: int, per_page: int) -> Optional[List[Dict[str, Any]]]:
+		releases = self.repositories.get(repository)
+		if releases is None: return None
+		served = []
+		for release in releases[(page - 1) * per_page:page * per_page]:
+			release = dict(release, assets=[dict(asset, browser_download_url=self.asset_url(asset['id'])) for asset in release['assets']])
+			served.append(release)
+		return served
+
+	def graphql_repository(self, repository: str, releases: int, assets: int) -> Optional[Dict[str, Any]]:
+		"""Answer one aliased repository lookup from GitHubGraphQL's query."""
+		served = self.repositories.get(repository)
+		if served is None: return None
+		nodes = [{
+			'databaseId': release['id'],
+			'name': release['name'],
+			'tagName': release['tag_name'],
+			'isPrerelease': release['prerelease'],
+			'releaseAssets': {'nodes': [{
+				'id': f"RA_{asset['id']}",
+				'name': asset['name'],
+				'size': asset['size'],
+				'downloadUrl': self.asset_url(asset['id']),
+				'updatedAt': asset['updated_at']
+			} for asset in release['assets'][:assets]]}
+		} for release in served[:releases]]
+		return {
+			'databaseId': abs(hash(repository)) % 100000,
+			'nameWithOwner': repository,
+			'releases': {'pageInfo': {'hasNextPage': len(served) > releases}, 'nodes': nodes}
+		}
+
+	def _handler_class(self):
+		standin = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = 'HTTP/1.1'
+
+			def log_message(self, format, *args):
+				pass
+
+			def send_json(self, data, headers=None, status=200):
+				body = json.dumps(data).encode('utf-8')
+				etag = f'"{hashlib.sha1(body).hexdigest()}"'
+				if status == 200 and self.headers.get('If-None-Match') == etag:
+					standin.count('not_modified', self.path)
+					self.send_response(304)
+					self.send_header('ETag', etag)
+					for key, value in (headers or {}).items():
+						self.send_header(key, value)
+					self.send_header('Content-Length', '0')
+					self.end_headers()
+					return
+				self.send_response(status)
+				self.send_header('Content-Type', 'application/json')
+				self.send_header('ETag', etag)
+				for key, value in (headers or {}).items():
+					self.send_header(key, value)
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def send_empty(self, status, headers=None):
+				self.send_response(status)
+				for key, value in (headers or {}).items():
+					self.send_header(key, value)
+				self.send_header('Content-Length', '0')
+				self.end_headers()
+
+			def do_HEAD(self):
+				if standin.config.latency: time.sleep(standin.config.latency)
+				self.send_empty(200)
+
+			def do_GET(self):
+				if standin.config.latency: time.sleep(standin.config.latency)
+				url = urlparse(self.path)
+				parts = url.path.strip('/').split('/')
+				if parts[0] == 'repos' and len(parts) in (3, 4):
+					standin.count('api_requests', url.path)
+					return self.serve_api(parts, parse_qs(url.query))
+				if parts[0] == 'download' and len(parts) == 2:
+					standin.count('redirects', url.path)
+					if standin.config.redirect_downloads:
+						return self.send_empty(302, {'Location': f"{standin.base_url}/cdn/{parts[1]}?signature=standin"})
+					return self.serve_asset(parts[1])
+				if parts[0] == 'cdn' and len(parts) == 2:
+					return self.serve_asset(parts[1])
+				self.send_empty(404)
+
+			def serve_api(self, parts, query):
+				headers, exceeded = standin.take_api_call()
+				if exceeded:
+					standin.count('rate_limited', self.path)
+					return self.send_json({'message': 'API rate limit exceeded'}, headers, status=403)
+				repository = f"{parts[1]}/{parts[2]}"
+				if repository not in standin.repositories:
+					return self.send_empty(404, headers)
+				if len(parts) == 3:
+					return self.send_json({'id': abs(hash(repository)) % 100000, 'full_name': repository}, headers)
+				if parts[3] != 'releases':
+					return self.send_empty(404, headers)
+				per_page = min(MAX_PER_PAGE, int(query.get('per_page', ['30'])[0]))
+				page = int(query.get('page', ['1'])[0])
+				releases = standin.releases_page(repository, page, per_page)
+				if page * per_page < len(standin.repositories[repository]):
+					headers['Link'] = f'<{standin.base_url}/repos/{repository}/releases?per_page={per_page}&page={page + 1}>; rel="next"'
+				self.send_json(releases, headers)
+
+			def do_POST(self):
+				if standin.config.latency: time.sleep(standin.config.latency)
+				body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+				if self.path != '/graphql':
+					return self.send_empty(404)
+				standin.count('api_requests', self.path)
+				headers, exceeded = standin.take_api_call()
+				if not self.headers.get('Authorization'):
+					return self.send_json({'message': 'This endpoint requires you to be authenticated.'}, headers, status=401)
+				if exceeded:
+					standin.count('rate_limited', self.path)
+					return self.send_json({'message': 'API rate limit exceeded'}, headers, status=403)
+				variables = json.loads(body).get('variables', {})
+				data, errors = {}, []
+				# The query's repository lookups are aliased r0, r1, ... in the order of their variables
+				i = 0
+				while f"owner{i}" in variables:
+					repository = f"{variables[f'owner{i}']}/{variables[f'name{i}']}"
+					data[f"r{i}"] = standin.graphql_repository(repository, variables['releases'], variables['assets'])
+					if data[f"r{i}"] is None:
+						errors.append({'type': 'NOT_FOUND', 'path': [f"r{i}"], 'message': f"Could not resolve to a Repository with the name '{repository}'."})
+					i += 1
+				self.send_json(dict({'data': data}, **({'errors': errors} if errors else {})), headers)
+
+			def serve_asset(self, asset_id):
+				payload = standin.payloads.get(int(asset_id)) if asset_id.isdigit() else None
+				if payload is None:
+					return self.send_empty(404)
+				start = 0
+				requested = self.headers.get('Range')
+				if requested:
+					start = int(requested.split('=')[1].split('-')[0])
+					if start >= len(payload):
+						return self.send_empty(416, {'Content-Range': f"bytes */{len(payload)}"})
+					self.send_response(206)
+					self.send_header('Content-Range', f"bytes {start}-{len(payload) - 1}/{len(payload)}")
+				else:
+					self.send_response(200)
+				self.send_header('Content-Type', 'application/octet-stream')
+				self.send_header('Content-Length', str(len(payload) - start))
+				self.end_headers()
+				standin.count('downloads', f"/cdn/{asset_id}")
+				self.write_throttled(memoryview(payload)[start:])
+
+			def write_throttled(self, data):
+				bandwidth = standin.config.bandwidth
+				started = time.perf_counter()
+				sent = 0
+				for offset in range(0, len(data), WRITE_CHUNK_SIZE):
+					chunk = data[offset:offset + WRITE_CHUNK_SIZE]
+					self.wfile.write(chunk)
+					sent += len(chunk)
+					standin.count('bytes_sent', '', len(chunk))
+					if bandwidth:
+						# Sleep until the bytes sent so far fit within the configured rate
+						delay = sent / bandwidth - (time.perf_counter() - started)
+						if delay > 0: time.sleep(delay)
+
+		return Handler
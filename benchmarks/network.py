@@ -0,0 +1,119 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Measure Downloader against a local GitHub stand-in, without touching github.com.
+
+Run from the repository root:
+
+	python -m benchmarks.network --latency-ms 80 --bandwidth-mbps 20 --filler 40
+
+Each scenario uses the components from data/installer.json and reports how long
+resolving releases took, download throughput, and how many API calls were made.
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from typing import List
+
+from ASS.downloader import Downloader
+from ASS.headless import component_info, load_installer_config
+from benchmarks.github_standin import GitHubStandin, StandinConfig
+
+# cold: nothing cached; revalidate: metadata cached but stale, so every call is a conditional GET;
+# cached: metadata fresh and downloads already in the store
+SCENARIOS = ("cold", "revalidate", "cached")
+
+@dataclass
+class Result:
+	scenario: str
+	workers: int
+	resolve_seconds: float
+	download_seconds: float
+	downloaded_bytes: int
+	api_requests: int
+	not_modified: int
+	asset_requests: int
+
+	@property
+	def throughput(self) -> float:
+		return self.downloaded_bytes / self.download_seconds if self.download_seconds > 0 else 0.0
+
+def run_once(standin: GitHubStandin, download_info, app_dir: str, workers: int, metadata_ttl: float, **options) -> Result:
+	download_info = json.loads(json.dumps(download_info))
+	standin.reset_counters()
+	downloader = Downloader(download_info, download_dir=app_dir, max_workers=workers, metadata_ttl=metadata_ttl, api_url=standin.base_url, **options)
+	started = time.perf_counter()
+	for name in download_info:
+		downloader.resolve_asset(name)
+	resolved = time.perf_counter()
+	downloader.download_all()
+	finished = time.perf_counter()
+	missing = [name for name, data in download_info.items() if 'download_path' not in data]
+	if missing:
+		raise RuntimeError(f"Benchmark downloads failed for {', '.join(missing)}; see the log")
+	counters = standin.counters
+	return Result("", workers, resolved - started, finished - resolved, counters.bytes_sent, counters.api_requests, counters.not_modified, counters.downloads)
+
+def run_scenario(standin: GitHubStandin, download_info, scenario: str, workers: int, **options) -> Result:
+	app_dir = tempfile.mkdtemp(prefix="ass-bench-")
+	try:
+		if scenario != "cold":
+			# Warm the caches first; that run is not what's being measured
+			run_once(standin, download_info, app_dir, workers, metadata_ttl=3600, **options)
+		if scenario == "revalidate":
+			shutil.rmtree(f"{app_dir}/downloads")
+		result = run_once(standin, download_info, app_dir, workers, metadata_ttl=0 if scenario == "revalidate" else 3600, **options)
+		result.scenario = scenario
+		return result
+	finally:
+		shutil.rmtree(app_dir, ignore_errors=True)
+
+def print_table(results: List[Result]):
+	print(f"{'scenario':<12}{'workers':>8}{'resolve s':>11}{'download s':>12}{'MB/s':>9}{'API calls':>11}{'304s':>6}{'assets':>8}")
+	for r in results:
+		print(f"{r.scenario:<12}{r.workers:>8}{r.resolve_seconds:>11.3f}{r.download_seconds:>12.3f}{r.throughput / 1e6:>9.2f}{r.api_requests:>11}{r.not_modified:>6}{r.asset_requests:>8}")
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--config", default="data/installer.json", help="installer configuration whose components are served (default: %(default)s)")
+	parser.add_argument("--latency-ms", type=float, default=50, help="delay added to every response (default: %(default)s)")
+	parser.add_argument("--bandwidth-mbps", type=float, default=0, help="per-transfer bandwidth in megabits per second, 0 for unlimited (default: %(default)s)")
+	parser.add_argument("--filler", type=int, default=30, help="unrelated releases ahead of each component's release, to make lookups page (default: %(default)s)")
+	parser.add_argument("--payload-kb", type=int, default=2048, help="size of each asset (default: %(default)s)")
+	parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="download worker counts to compare (default: %(default)s)")
+	parser.add_argument("--limit-mbps", type=float, default=0, help="the installer's own bandwidth limit, 0 for none (default: %(default)s)")
+	parser.add_argument("--resolver", choices=("rest", "graphql"), default="rest", help="how releases are looked up; graphql sends a token to the stand-in (default: %(default)s)")
+	parser.add_argument("--adaptive", action="store_true", help="let the installer choose how many downloads run at once, up to --workers")
+	parser.add_argument("--scenario", choices=SCENARIOS, nargs="+", default=list(SCENARIOS))
+	parser.add_argument("--repeat", type=int, default=1, help="runs per scenario; the fastest is reported (default: %(default)s)")
+	parser.add_argument("--json", metavar="PATH", help="also write the results here, for comparing runs")
+	args = parser.parse_args(argv)
+	logging.basicConfig(level=logging.WARNING)
+
+	download_info = component_info(load_installer_config(args.config)['download_info'])
+	config = StandinConfig(latency=args.latency_ms / 1000, bandwidth=int(args.bandwidth_mbps * 1e6 / 8), filler_releases=args.filler, payload_size=args.payload_kb * 1024)
+	options = dict(bandwidth_limit=args.limit_mbps * 1e6 / 8, adaptive_concurrency=args.adaptive, resolver=args.resolver)
+	if args.resolver == "graphql":
+		# The stand-in only checks that one is there
+		options['token'] = "standin-token"
+	results = []
+	with GitHubStandin(download_info, config) as standin:
+		for scenario in args.scenario:
+			for workers in args.workers:
+				runs = [run_scenario(standin, download_info, scenario, workers, **options) for _ in range(max(1, args.repeat))]
+				results.append(min(runs, key=lambda r: r.resolve_seconds + r.download_seconds))
+	print_table(results)
+	if args.json:
+		with open(args.json, 'w', encoding='utf-8') as f:
+			json.dump({'config': asdict(config), 'results': [dict(asdict(r), throughput=r.throughput) for r in results]}, f, indent=1)
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
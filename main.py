@@ -2,12 +2,16 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+# Imported first so the startup timer covers everything after it
+from ASS.startup_timing import startup
+
 from appdirs import user_data_dir
 from dotenv import load_dotenv
 from pathlib import Path
+import argparse
 import logging
-import wx
-import ASS.installer_frame
+import os
+import sys
 
 APP_DIR = None
 
@@ -24,12 +28,129 @@ logging.basicConfig(filename=log_file_path, filemode='w', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 logger.info('starting')
 
-def main():
+def parse_args(argv=None):
+	parser = argparse.ArgumentParser(prog="ass", description="Installs Stardew-Access and required dependencies.")
+	parser.add_argument("--headless", action="store_true", help="install without opening a window")
+	parser.add_argument("--path", action="append", default=[], help="Stardew Valley folder to install into (required with --headless); repeat to install into several copies of the game at once")
+	parser.add_argument("--config", default="data/installer.json", help="installer configuration to read (default: %(default)s)")
+	parser.add_argument("--variant", action="append", default=[], metavar="COMPONENT", help="install the alternative build of COMPONENT, e.g. the debug build of Stardew-Access")
+	parser.add_argument("--prerelease", action="append", default=[], metavar="COMPONENT", help="allow prereleases of COMPONENT")
+	parser.add_argument("--platform", choices=("windows", "linux", "macOS"), help="which platform's SMAPI to install (default: this machine's)")
+	parser.add_argument("--bundle", metavar="FILE", help="install from a bundle made with --export-bundle instead of downloading")
+	parser.add_argument("--export-bundle", metavar="FILE", help="download the selected components into FILE for offline installs, without installing (implies --headless)")
+	parser.add_argument("--cache-server", metavar="URL", help="fetch downloads through the LAN cache server at URL, e.g. http://192.168.1.10:8750")
+	parser.add_argument("--serve-cache", nargs="?", const=str(8750), metavar="[HOST:]PORT", help="run a cache server other installers can download through, until interrupted (default: this machine's LAN address, port %(const)s)")
+	parser.add_argument("-v", "--verbose", action="store_true", help="print progress while downloading and unpacking")
+	args = parser.parse_args(argv)
+	if args.serve_cache:
+		if args.path or args.bundle or args.export_bundle:
+			parser.error("--serve-cache does not install, so it cannot be combined with --path, --bundle or --export-bundle")
+	elif args.export_bundle:
+		if args.path or args.bundle:
+			parser.error("--export-bundle does not install, so it cannot be combined with --path or --bundle")
+		args.headless = True
+	elif args.headless and not args.path:
+		parser.error("--path is required with --headless")
+	return args
+
+def run_export_bundle(args):
+	from ASS.headless import component_info, export_bundle, load_installer_config, select_variants
+	from ASS.observer import ConsoleObserver
+	observer = ConsoleObserver(verbose=args.verbose)
+	try:
+		installer_config = load_installer_config(args.config)
+		download_info = component_info(installer_config['download_info'])
+		select_variants(download_info, args.variant, args.prerelease)
+		export_bundle(download_info, installer_config.get('settings', {}), get_app_dir(), observer, args.export_bundle, token=os.environ.get('ASS_GITHUB_TOKEN'))
+	except KeyboardInterrupt:
+		observer.log("Canceled.")
+		return 130
+	except Exception as e:
+		logger.exception("Bundle export failed")
+		observer.log(f"Could not write the bundle: {e}")
+		return 1
+	return 0
+
+def serve_cache(args):
+	from ASS.cache_server import CacheServer
+	from ASS.headless import component_info, downloader_options, load_installer_config
+	from ASS.observer import ConsoleObserver
+	observer = ConsoleObserver(verbose=args.verbose)
+	host, _, port = args.serve_cache.rpartition(':')
+	try:
+		config = load_installer_config(args.config)
+		server = CacheServer(get_app_dir(), component_info(config.get('download_info', {})), downloader_options(config.get('settings', {})),
+			token=os.environ.get('ASS_GITHUB_TOKEN'), host=host or None, port=int(port), observer=observer)
+	except (OSError, ValueError) as e:
+		logger.exception("Could not start the cache server")
+		observer.log(f"Could not start the cache server: {e}")
+		return 1
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		observer.log("Stopped.")
+	finally:
+		server.shutdown()
+	return 0
+
+def run_headless(args):
+	from ASS.headless import component_info, install, load_installer_config, select_variants
+	from ASS.observer import ConsoleObserver
+	observer = ConsoleObserver(verbose=args.verbose)
+	try:
+		installer_config = load_installer_config(args.config)
+		download_info = component_info(installer_config['download_info'])
+		select_variants(download_info, args.variant, args.prerelease)
+		settings = installer_config.get('settings', {})
+		token = os.environ.get('ASS_GITHUB_TOKEN')
+		if len(args.path) > 1:
+			from ASS.multi_target import provision
+			results = provision(download_info, settings, args.path, get_app_dir(), observer, token=token, platform=args.platform, bundle=args.bundle)
+			failed = [result for result in results if not result.ok]
+			if failed:
+				observer.log(f"Installation failed for {len(failed)} of {len(results)} folders.")
+				return 1
+		else:
+			install(download_info, settings, os.path.abspath(os.path.expanduser(args.path[0])), get_app_dir(),
+				observer, token=token, platform=args.platform, bundle=args.bundle)
+	except KeyboardInterrupt:
+		observer.log("Canceled.")
+		return 130
+	except Exception as e:
+		logger.exception("Headless install failed")
+		observer.log(f"Installation failed: {e}")
+		return 1
+	if not observer.completed:
+		observer.log("Installation did not complete, see the log above for the components that failed.")
+		return 1
+	observer.log("Installation complete.")
+	return 0
+
+def main(argv=None):
+	args = parse_args(argv)
 	load_dotenv()
-	app = wx.App(False)
-	ass = ASS.installer_frame.InstallerFrame(None, title="Accessible Stardew Setup", app_dir=get_app_dir())
-	ass.Show()
+	if args.cache_server:
+		# Read by downloader_options, and wins over the one in installer.json
+		os.environ['ASS_CACHE_SERVER'] = args.cache_server
+	if args.serve_cache:
+		return serve_cache(args)
+	if args.export_bundle:
+		return run_export_bundle(args)
+	if args.headless:
+		return run_headless(args)
+	with startup.measure("import wx"):
+		import wx
+	with startup.measure("import installer frame"):
+		import ASS.installer_frame
+	with startup.measure("create app"):
+		app = wx.App(False)
+	with startup.measure("create frame"):
+		ass = ASS.installer_frame.InstallerFrame(None, title="Accessible Stardew Setup", app_dir=get_app_dir())
+		ass.Show()
+	# Runs once the main loop has handled the events queued so far, including the first paint
+	wx.CallAfter(startup.finish)
 	app.MainLoop()
+	return 0
 
 if __name__ == "__main__":
-	main()
\ No newline at end of file
+	sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,110 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import os
+import tempfile
+import time
+import unittest
+
+from ASS import steam_config, vdf
+from ASS.exceptions import VDFError
+
+LOCALCONFIG = """"UserLocalConfigStore"
+{
+	"friends"
+	{
+		"PersonaName"		"Abigail"
+		"Groups" { "1" "a {brace} in a string" }
+	}
+	// a comment with { a brace
+	"Software"
+	{
+		"Valve"
+		{
+			"Steam"
+			{
+				"apps"
+				{
+					"413150"
+					{
+						"LastPlayed"		"1700000000"
+					}
+				}
+			}
+		}
+	}
+}
+"""
+
+class FindTests(unittest.TestCase):
+	def test_finds_values_and_blocks(self):
+		found = vdf.find(LOCALCONFIG, [steam_config.PERSONA_PATH, steam_config.APPS_PATH + ("413150",)])
+		persona = found[steam_config._key(steam_config.PERSONA_PATH)]
+		self.assertFalse(persona.is_block)
+		self.assertEqual(persona.value.value, "Abigail")
+		app = found[steam_config._key(steam_config.APPS_PATH + ("413150",))]
+		self.assertTrue(app.is_block)
+		self.assertEqual(LOCALCONFIG[app.value.start], "{")
+		self.assertEqual(LOCALCONFIG[app.end.start], "}")
+
+	def test_matches_keys_case_insensitively(self):
+		found = vdf.find(LOCALCONFIG, [("userlocalconfigstore", "FRIENDS", "personaname")])
+		self.assertEqual(found[("userlocalconfigstore", "friends", "personaname")].value.value, "Abigail")
+
+	def test_missing_path_is_absent(self):
+		self.assertEqual(vdf.find(LOCALCONFIG, [steam_config.APPS_PATH + ("70",)]), {})
+
+class SetValueTests(unittest.TestCase):
+	def app_block(self, text):
+		return vdf.find(text, [steam_config.APPS_PATH + ("413150",)])[steam_config._key(steam_config.APPS_PATH + ("413150",))]
+
+	def test_inserts_missing_key_in_steams_layout(self):
+		patched = vdf.set_value(LOCALCONFIG, self.app_block(LOCALCONFIG), "LaunchOptions", 'run "%command%"')
+		expected = LOCALCONFIG.replace('"1700000000"\n', '"1700000000"\n\t\t\t\t\t\t"LaunchOptions"\t\t"run \\"%command%\\""\n')
+		self.assertEqual(patched, expected)
+		self.assertEqual(vdf.parse(patched)["UserLocalConfigStore"]["Software"]["Valve"]["Steam"]["apps"]["413150"]["LaunchOptions"], 'run "%command%"')
+
+	def test_replaces_only_the_value(self):
+		text = vdf.set_value(LOCALCONFIG, self.app_block(LOCALCONFIG), "LaunchOptions", "old")
+		patched = vdf.set_value(text, self.app_block(text), "launchoptions", "new")
+		self.assertEqual(patched, text.replace('"old"', '"new"'))
+
+	def test_keeps_crlf_line_endings(self):
+		text = LOCALCONFIG.replace("\n", "\r\n")
+		patched = vdf.set_value(text, self.app_block(text), "LaunchOptions", "x")
+		self.assertNotIn("\n", patched.replace("\r\n", ""))
+
+	def test_refuses_to_replace_a_block(self):
+		with self.assertRaises(VDFError):
+			vdf.set_value(LOCALCONFIG, vdf.find(LOCALCONFIG, [("UserLocalConfigStore",)])[("userlocalconfigstore",)], "friends", "x")
+
+class TruncatedInputTests(unittest.TestCase):
+	def test_truncated_skipped_block_fails_quickly(self):
+		# Cut off inside a block find() steps over, with plenty of slashes and strings to backtrack through
+		text = '"UserLocalConfigStore"\n{\n\t"friends"\n\t{\n' + "".join(f'\t\t"k{i}"\t\t"v/{i}" / \n' for i in range(20000))
+		started = time.perf_counter()
+		with self.assertRaises(VDFError):
+			vdf.find(text, [steam_config.APPS_PATH])
+		self.assertLess(time.perf_counter() - started, 2)
+
+	def test_truncated_file_fails_to_parse(self):
+		with self.assertRaises(VDFError):
+			vdf.parse(LOCALCONFIG[:LOCALCONFIG.index("LastPlayed")])
+
+	def test_unterminated_string_fails(self):
+		with self.assertRaises(VDFError):
+			vdf.find('"a"\n{\n\t"b"\t"unterminated\n', [("a", "c")])
+
+class FindAccountsTests(unittest.TestCase):
+	def test_damaged_account_does_not_hide_others(self):
+		with tempfile.TemporaryDirectory() as userdata:
+			for account, text in (("1", LOCALCONFIG), ("2", LOCALCONFIG[:200])):
+				os.makedirs(os.path.join(userdata, account, "config"))
+				with open(os.path.join(userdata, account, "config", "localconfig.vdf"), "w", encoding="utf-8") as f:
+					f.write(text)
+			accounts = steam_config.find_accounts(userdata, "413150")
+		self.assertEqual(list(accounts), ["Abigail"])
+
+if __name__ == '__main__':
+	unittest.main()